@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from .core import DailyStore, build_review, execute_pending_commands, list_tasks
+from .history import render_history
+from .model import Day, Note, Task
+
+PACKAGE_ROOT = Path(__file__).resolve().parent.parent
+SECTIONS = ("store", "history", "throughput", "cli")
+# Fixed snapshot so review timings measure DayDrive rather than git.
+FIXED_SNAPSHOT = {"branch": "main", "dirty_files": 3, "today_commits": ["abc1234 bench"]}
+
+DEFAULT_PARAMS = {
+    "tasks": 5000,
+    "notes": 2000,
+    "days": 730,
+    "day_tasks": 20,
+    "throughput_tasks": 200,
+    "jobs": [1, 4],
+    "repeat": 5,
+    "seed": 1,
+}
+QUICK_PARAMS = dict(DEFAULT_PARAMS, tasks=500, notes=200, days=60, throughput_tasks=50, repeat=3)
+
+COMMANDS = ["make", "pytest -q", "npm run build", "cargo test", "ruff check .", "./deploy.sh staging"]
+
+
+def synthetic_task(rng: random.Random, task_id: int, day: date) -> Task:
+    command = rng.choice(COMMANDS)
+    task = Task(
+        id=task_id,
+        text=f"{command} #{task_id}",
+        command=command,
+        created_at=f"{day.isoformat()}T08:00:00",
+        inputs=["src/**/*.py"] if rng.random() < 0.3 else [],
+        priority=rng.choice([0, 0, 0, 1, 5]),
+    )
+    roll = rng.random()
+    if roll < 0.6:
+        finished = f"{day.isoformat()}T{9 + task_id % 10:02d}:{task_id % 60:02d}:{task_id * 7 % 60:02d}"
+        returncode = 0 if roll < 0.5 else 1
+        task.status = "done" if returncode == 0 else "failed"
+        task.started_at = finished
+        task.done_at = finished if returncode == 0 else ""
+        task.last_run = {
+            "returncode": returncode,
+            "stdout_tail": "\n".join(f"line {n} of output" for n in range(20)),
+            "stderr_tail": "" if returncode == 0 else "error: something failed",
+            "finished_at": finished,
+            "duration_s": round(rng.lognormvariate(1.0, 1.0), 3),
+            "cpu_user_s": round(rng.random(), 3),
+            "cpu_sys_s": round(rng.random() / 10, 3),
+            "max_rss_kb": rng.randint(10_000, 2_000_000),
+        }
+    return task
+
+
+def synthetic_day(day: date, tasks: int, notes: int, seed: int) -> Day:
+    rng = random.Random(f"{seed}-{day.isoformat()}")
+    stamp = f"{day.isoformat()}T08:00:00"
+    payload = Day(date=day.isoformat(), created_at=stamp, updated_at=stamp)
+    for task_id in range(1, tasks + 1):
+        payload.add(synthetic_task(rng, task_id, day))
+    payload.notes = [Note(text=f"Note {index}: follow up on review feedback", created_at=stamp) for index in range(notes)]
+    return payload
+
+
+def populate(store: DailyStore, days: list[date], tasks: int, notes: int, seed: int) -> None:
+    store.ensure()
+    for day in days:
+        store.save(day, synthetic_day(day, tasks, notes, seed))
+
+
+def timed(fn: Callable[[], object], repeat: int) -> dict:
+    samples = []
+    for _ in range(max(repeat, 1)):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return {
+        "repeat": len(samples),
+        "median_s": round(statistics.median(samples), 6),
+        "min_s": round(min(samples), 6),
+        "max_s": round(max(samples), 6),
+    }
+
+
+def traced_peak_kb(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak // 1024
+
+
+def bench_store(root: Path, backend: str, params: dict) -> list[dict]:
+    store = DailyStore(root / backend, storage=backend)
+    today = date.today()
+    populate(store, [today], params["tasks"], params["notes"], params["seed"])
+    repeat = params["repeat"]
+    payload = store.load_or_create(today)
+    rng = random.Random(params["seed"])
+    snapshots = {root: FIXED_SNAPSHOT}
+
+    def save_one_change() -> None:
+        task = payload.get(rng.randint(1, params["tasks"]))
+        task.text = f"renamed {rng.random()}"
+        store.save(today, payload)
+
+    def working_set() -> None:
+        loaded = store.load_or_create(today)
+        list_tasks(loaded, store.history)
+        build_review(loaded, root, store.history, snapshots)
+
+    cases = {
+        "load_or_create": lambda: store.load_or_create(today),
+        "save": lambda: store.save(today, payload),
+        "save_one_changed": save_one_change,
+        "list_tasks": lambda: list_tasks(payload, store.history),
+        "build_review": lambda: build_review(payload, root, store.history, snapshots),
+        "mark_done": lambda: store.mark_done(today, rng.randint(1, params["tasks"])),
+        "add_task": lambda: store.add_task(today, "bench", command="true"),
+    }
+    results = [{"name": f"store.{backend}.{name}", **timed(fn, repeat)} for name, fn in cases.items()]
+    results.append({"name": f"store.{backend}.working_set", **timed(working_set, 1), "peak_kb": traced_peak_kb(working_set)})
+    return results
+
+
+def bench_history(root: Path, params: dict) -> list[dict]:
+    store = DailyStore(root / "history")
+    today = date.today()
+    days = [today - timedelta(days=offset) for offset in range(params["days"], 0, -1)]
+    populate(store, days, params["day_tasks"], 5, params["seed"])
+    repeat = params["repeat"]
+    since = (today - timedelta(days=365)).isoformat()
+    oldest = days[0]
+
+    results = [
+        {"name": "history.rebuild", **timed(store.rebuild_history, 1)},
+        {"name": "history.render", **timed(lambda: render_history(store.history, since, slowest=10, trend=True), repeat)},
+        {"name": "history.days", **timed(store.backend.days, repeat)},
+        {"name": "history.load_old_day", **timed(lambda: store.load_or_create(oldest), repeat)},
+        {"name": "history.compact", **timed(lambda: store.compact(today - timedelta(days=30)), 1)},
+        {"name": "history.load_archived_day", **timed(lambda: store.load_or_create(oldest), repeat)},
+    ]
+    return results
+
+
+def bench_throughput(root: Path, params: dict) -> list[dict]:
+    results = []
+    count = params["throughput_tasks"]
+    for jobs in params["jobs"]:
+        store = DailyStore(root / f"throughput-{jobs}")
+        today = date.today()
+        payload = Day(date=today.isoformat())
+        for task_id in range(1, count + 1):
+            payload.add(Task(id=task_id, text=f"noop {task_id}", command="true"))
+        store.ensure()
+        store.save(today, payload)
+        logs = store.run_logs()
+
+        def run() -> None:
+            # Checkpoint through the store like `run` does, so persistence cost is part of the number.
+            execute_pending_commands(
+                payload,
+                root,
+                run_all=True,
+                logs=logs,
+                on_update=lambda task: store.update_task(today, task),
+                jobs=jobs,
+            )
+
+        timing = timed(run, 1)
+        results.append(
+            {
+                "name": f"throughput.jobs{jobs}",
+                **timing,
+                "tasks": count,
+                "tasks_per_s": round(count / timing["median_s"], 2) if timing["median_s"] else None,
+            }
+        )
+    return results
+
+
+# Runs `python -c`/`python -m` arguments and records the child's own VmHWM at exit. ru_maxrss from
+# wait4 is no use here: Linux carries the parent's high-water mark across fork and exec.
+PROBE = """
+import atexit, os, runpy, sys
+
+def _report():
+    try:
+        with open("/proc/self/status", encoding="utf-8") as handle:
+            peak = next((line.split()[1] for line in handle if line.startswith("VmHWM:")), "")
+        with open(os.environ["DAYDRIVE_BENCH_PEAK"], "w", encoding="utf-8") as out:
+            out.write(peak)
+    except OSError:
+        pass
+
+atexit.register(_report)
+mode, target, *rest = sys.argv[1:]
+sys.argv = [target, *rest]
+if mode == "-m":
+    runpy.run_module(target, run_name="__main__", alter_sys=True)
+else:
+    exec(compile(target, "<string>", "exec"), {"__name__": "__main__"})
+"""
+
+
+def run_child(args: list[str], env: dict, cwd: Path) -> tuple[float, int | None]:
+    peak_path = cwd / ".peak"
+    peak_path.unlink(missing_ok=True)
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-c", PROBE, *args],
+        cwd=cwd,
+        env=dict(env, DAYDRIVE_BENCH_PEAK=str(peak_path)),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        check=False,
+    )
+    elapsed = time.perf_counter() - started
+    if proc.returncode != 0:
+        stderr = proc.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"python {' '.join(args)} exited with {proc.returncode}: {stderr}")
+    try:
+        return elapsed, int(peak_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return elapsed, None
+
+
+def bench_cli(root: Path, params: dict) -> list[dict]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(PACKAGE_ROOT), env.get("PYTHONPATH", "")]))
+    cwd = root / "cli-cwd"
+    cwd.mkdir(exist_ok=True)
+    cases = [
+        ("cli.python_startup", ["-c", "pass"], None),
+        ("cli.import", ["-c", "import daydrive.cli"], None),
+    ]
+    for backend in ("json", "sqlite"):
+        for command in ("list", "start", "review"):
+            cases.append((f"cli.{backend}.{command}", ["-m", "daydrive.cli", command], backend))
+    cases.append(("cli.json.history", ["-m", "daydrive.cli", "history", "--trend", "--slowest", "10"], "json"))
+
+    results = []
+    for name, args, backend in cases:
+        case_env = dict(env)
+        if backend is not None:
+            # Reuses the large day written by the store section.
+            case_env["DAYDRIVE_HOME"] = str(root / backend)
+            case_env["DAYDRIVE_STORAGE"] = backend
+        peaks: list[int] = []
+
+        def once() -> None:
+            _, rss = run_child(args, case_env, cwd)
+            if rss is not None:
+                peaks.append(rss)
+
+        results.append({"name": name, **timed(once, params["repeat"]), "peak_rss_kb": max(peaks, default=None)})
+    return results
+
+
+def _revision() -> str:
+    try:
+        proc = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=PACKAGE_ROOT, capture_output=True, text=True, check=False
+        )
+    except OSError:
+        return ""
+    return proc.stdout.strip() if proc.returncode == 0 else ""
+
+
+def run_benchmarks(params: dict, sections: tuple[str, ...] = SECTIONS) -> dict:
+    results: list[dict] = []
+    with tempfile.TemporaryDirectory(prefix="daydrive-bench-") as tmp:
+        root = Path(tmp)
+        # The CLI section reads the stores written by the store section.
+        if "store" in sections or "cli" in sections:
+            for backend in ("json", "sqlite"):
+                store_results = bench_store(root, backend, params)
+                if "store" in sections:
+                    results.extend(store_results)
+        if "history" in sections:
+            results.extend(bench_history(root, params))
+        if "throughput" in sections:
+            results.extend(bench_throughput(root, params))
+        if "cli" in sections:
+            results.extend(bench_cli(root, params))
+
+    return {
+        "meta": {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "revision": _revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": params,
+            "sections": list(sections),
+        },
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict) -> str:
+    lines = []
+    if current["meta"]["params"] != baseline["meta"].get("params"):
+        lines.append("warning: benchmark parameters differ from the baseline")
+    before = {row["name"]: row for row in baseline.get("results", [])}
+    lines.append(f"{'baseline':>10} {'current':>10} {'change':>8}  name")
+    for row in current["results"]:
+        old = before.get(row["name"])
+        if old is None or not old.get("median_s"):
+            lines.append(f"{'-':>10} {row['median_s']:>10.4f} {'new':>8}  {row['name']}")
+            continue
+        change = (row["median_s"] / old["median_s"] - 1) * 100
+        lines.append(f"{old['median_s']:>10.4f} {row['median_s']:>10.4f} {change:>+7.1f}%  {row['name']}")
+    return "\n".join(lines)
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark DayDrive storage, reporting and CLI latency")
+    parser.add_argument("--quick", action="store_true", help="Use a small data set (for smoke runs)")
+    parser.add_argument("--only", action="append", choices=SECTIONS, default=[], help="Run only this section (repeatable)")
+    parser.add_argument("--tasks", type=int, help="Tasks in the large day")
+    parser.add_argument("--notes", type=int, help="Notes in the large day")
+    parser.add_argument("--days", type=int, help="Past day files for the history section")
+    parser.add_argument("--throughput-tasks", type=int, help="Trivial tasks per throughput run")
+    parser.add_argument("--jobs", type=int, action="append", help="Parallel jobs for throughput (repeatable)")
+    parser.add_argument("--repeat", type=int, help="Samples per measurement")
+    parser.add_argument("--seed", type=int, help="Seed for the generated data")
+    parser.add_argument("--output", type=Path, help="Write the JSON results here instead of stdout")
+    parser.add_argument("--compare", type=Path, help="Print changes against an earlier JSON result")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    params = dict(QUICK_PARAMS if args.quick else DEFAULT_PARAMS)
+    for key in ("tasks", "notes", "days", "throughput_tasks", "jobs", "repeat", "seed"):
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+
+    report = run_benchmarks(params, tuple(args.only) or SECTIONS)
+    text = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    if args.compare is not None:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print(compare(report, baseline), file=sys.stderr if args.output is None else sys.stdout)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
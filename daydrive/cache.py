@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import glob
+import hashlib
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+from .jsonfiles import read_json, write_json
+from .model import Task
+
+READ_CHUNK = 1024 * 1024
+# Files modified this recently are re-read: their mtime may not change on a quick second write.
+RACY_WINDOW_NS = 2_000_000_000
+
+
+def expand_inputs(root: Path, patterns: list[str]) -> list[Path]:
+    found: set[Path] = set()
+    for pattern in patterns:
+        for match in glob.glob(os.path.join(root, pattern), recursive=True):
+            path = Path(match)
+            if path.is_file():
+                found.add(path)
+    return sorted(found)
+
+
+class InputHasher:
+    def __init__(self, index_path: Path, max_entries: int = 50_000) -> None:
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self._index: dict[str, list] | None = None
+        self._dirty = False
+
+    @property
+    def index(self) -> dict[str, list]:
+        if self._index is None:
+            self._index = read_json(self.index_path)
+        return self._index
+
+    def file_digest(self, path: Path) -> str:
+        key = str(path.resolve())
+        stat = path.stat()
+        entry = self.index.get(key)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with path.open("rb") as handle:
+            for block in iter(lambda: handle.read(READ_CHUNK), b""):
+                digest.update(block)
+        value = digest.hexdigest()
+
+        self.index.pop(key, None)
+        if time.time_ns() - stat.st_mtime_ns > RACY_WINDOW_NS:
+            self.index[key] = [stat.st_mtime_ns, stat.st_size, value]
+            self._dirty = True
+        return value
+
+    def digest(self, root: Path, patterns: list[str], env_names: list[str]) -> str:
+        # An empty digest means "not cacheable": nothing matched, or an input vanished while hashing.
+        paths = expand_inputs(root, patterns)
+        if not paths:
+            return ""
+        combined = hashlib.sha256()
+        for path in paths:
+            try:
+                relative = path.relative_to(root)
+            except ValueError:
+                relative = path
+            try:
+                file_hash = self.file_digest(path)
+            except OSError:
+                return ""
+            combined.update(f"{relative}\0{file_hash}\n".encode("utf-8"))
+        for name in sorted(set(env_names)):
+            combined.update(f"env:{name}={os.environ.get(name, '')}\n".encode("utf-8"))
+        return combined.hexdigest()
+
+    def flush(self) -> None:
+        if not self._dirty or self._index is None:
+            return
+        overflow = len(self._index) - self.max_entries
+        if overflow > 0:
+            # Dict order is insertion order and re-hashed files are re-inserted, so drop the oldest.
+            for key in list(self._index)[:overflow]:
+                del self._index[key]
+        write_json(self.index_path, self._index)
+        self._dirty = False
+
+
+class ResultCache:
+    def __init__(self, root: Path, max_entries: int = 500) -> None:
+        self.root = root
+        self.max_entries = max_entries
+        self.results_path = root / "results.json"
+        self.hasher = InputHasher(root / "file-digests.json")
+        self._entries: dict[str, dict] | None = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> dict[str, dict]:
+        if self._entries is None:
+            self._entries = read_json(self.results_path)
+        return self._entries
+
+    def key_for(self, task: Task, cwd: Path, tree: Path | None = None) -> str:
+        # `tree` is where the command really runs (an isolated worktree); inputs are hashed there.
+        if not task.inputs:
+            return ""
+        root = cwd.resolve()
+        input_hash = self.hasher.digest(tree.resolve() if tree is not None else root, task.inputs, task.env)
+        if not input_hash:
+            return ""
+        # The same command and relative inputs in another checkout is a different result.
+        return hashlib.sha256(f"{root}\0{task.command}\0{input_hash}".encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> dict | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        entry["used_at"] = datetime.now().isoformat(timespec="seconds")
+        self._dirty = True
+        return entry
+
+    def store(self, key: str, command: str, last_run: dict) -> None:
+        now = datetime.now().isoformat(timespec="seconds")
+        self.entries[key] = {
+            "command": command,
+            "returncode": last_run.get("returncode", 0),
+            "stdout_tail": last_run.get("stdout_tail", ""),
+            "stderr_tail": last_run.get("stderr_tail", ""),
+            "log_path": last_run.get("log_path", ""),
+            "stored_at": now,
+            "used_at": now,
+        }
+        self._dirty = True
+
+    def evict(self) -> int:
+        overflow = len(self.entries) - self.max_entries
+        if overflow <= 0:
+            return 0
+        oldest = sorted(self.entries, key=lambda key: self.entries[key]["used_at"])[:overflow]
+        for key in oldest:
+            del self.entries[key]
+        self._dirty = True
+        return overflow
+
+    def flush(self) -> None:
+        self.hasher.flush()
+        if not self._dirty or self._entries is None:
+            return
+        self.evict()
+        write_json(self.results_path, self._entries)
+        self._dirty = False
@@ -1,19 +1,24 @@
 from __future__ import annotations
 
 import argparse
-from datetime import date
+from datetime import date, timedelta
 from pathlib import Path
 
 from .core import (
     DailyStore,
-    add_note,
-    add_task,
     build_review,
     execute_pending_commands,
     list_tasks,
-    mark_done,
+    recover_orphaned_tasks,
+    review_repos,
     summarize_tasks,
 )
+from .history import format_seconds, render_history
+from .model import Day
+from .scheduler import Capacity, retries_exhausted, schedule_fields
+from .snapshots import collect_snapshots
+from .watch import affected_tasks, watch_changes
+from .worktrees import WorktreePool, repo_root
 
 
 def parse_args() -> argparse.Namespace:
@@ -25,6 +30,25 @@ def parse_args() -> argparse.Namespace:
     add = sub.add_parser("add", help="Add a command task for today")
     add.add_argument("task_cmd", help="Shell command to run")
     add.add_argument("--name", default="", help="Optional short label for the task")
+    add.add_argument(
+        "--input",
+        dest="inputs",
+        action="append",
+        default=[],
+        help="Glob of files the command reads; enables result caching (repeatable)",
+    )
+    add.add_argument(
+        "--env",
+        dest="env",
+        action="append",
+        default=[],
+        help="Environment variable that affects the command's result (repeatable)",
+    )
+    add.add_argument("--priority", type=int, default=0, help="Higher runs first (default 0)")
+    add.add_argument("--cpu", type=float, default=1.0, help="CPU cores the task keeps busy (default 1)")
+    add.add_argument("--mem-mb", type=int, default=0, help="Memory the task needs, in MB")
+    add.add_argument("--retries", type=int, default=0, help="Max attempts before giving up (0 = unlimited)")
+    add.add_argument("--backoff", type=float, default=0.0, help="Seconds before the first retry; doubles each time")
 
     note = sub.add_parser("note", help="Capture a quick note")
     note.add_argument("text", help="Note text")
@@ -37,93 +61,311 @@ def parse_args() -> argparse.Namespace:
     run = sub.add_parser("run", help="Execute pending command tasks")
     run.add_argument("--limit", type=int, default=0, help="Optional max number of tasks to run")
     run.add_argument("--timeout", type=int, default=600, help="Command timeout in seconds")
+    run.add_argument("--compress-logs", action="store_true", help="Gzip the per-run output logs")
+    run.add_argument("--no-cache", action="store_true", help="Run tasks even if their inputs are unchanged")
+    run.add_argument("--jobs", type=int, default=1, help="Run up to N tasks in parallel")
+    run.add_argument("--max-load", type=float, default=0.0, help="Only start tasks below this load (default: CPU count)")
+    run.add_argument("--min-free-mb", type=int, help="Keep this much memory available (default: 256)")
+    run.add_argument("--isolate", action="store_true", help="Run each task in a pooled git worktree of HEAD")
+    run.add_argument("--pool-size", type=int, default=0, help="Max pooled worktrees (default: --jobs)")
+
+    watch = sub.add_parser("watch", help="Re-run tasks whose --input files change")
+    watch.add_argument("--interval", type=float, default=0.5, help="Seconds between polls")
+    watch.add_argument("--debounce", type=float, default=1.0, help="Quiet seconds before re-running")
+    watch.add_argument("--timeout", type=int, default=600, help="Command timeout in seconds")
+    watch.add_argument("--compress-logs", action="store_true", help="Gzip the per-run output logs")
+    watch.add_argument("--no-cache", action="store_true", help="Run tasks even if their inputs are unchanged")
+
+    history = sub.add_parser("history", help="Query run history across days")
+    history.add_argument("--days", type=int, default=30, help="Look back this many days")
+    history.add_argument("--match", default="", help="Only commands or task names containing this text")
+    history.add_argument("--slowest", type=int, default=0, help="Also list the N slowest runs")
+    history.add_argument("--trend", action="store_true", help="Also show per-day runs and failure rate")
+    history.add_argument("--rebuild", action="store_true", help="Rebuild the index from all stored days")
+    history.add_argument(
+        "--compact-before",
+        type=date.fromisoformat,
+        default=None,
+        help="Archive day files older than this date (YYYY-MM-DD)",
+    )
 
-    sub.add_parser("review", help="Generate end-of-day review markdown")
+    review = sub.add_parser("review", help="Generate end-of-day review markdown")
+    review.add_argument(
+        "--repo",
+        dest="repos",
+        action="append",
+        default=[],
+        type=Path,
+        help="Also snapshot this git repo, on top of config.json workspaces (repeatable)",
+    )
 
     return parser.parse_args()
 
 
+def requeue_interrupted(store: DailyStore, today: date, payload: Day) -> None:
+    for task in recover_orphaned_tasks(payload):
+        store.update_task(today, task)
+        print(f"Requeued interrupted task {task.id}: {task.text}")
+
+
 def cmd_start(store: DailyStore) -> int:
     today = date.today()
     payload = store.load_or_create(today)
+    requeue_interrupted(store, today, payload)
     done, total = summarize_tasks(payload)
     print(f"DayDrive ready for {today.isoformat()}")
     print(f"Tasks complete: {done}/{total}")
-    print(list_tasks(payload))
+    print(list_tasks(payload, store.history))
     return 0
 
 
-def cmd_add(store: DailyStore, task_cmd: str, name: str) -> int:
+def cmd_add(
+    store: DailyStore,
+    task_cmd: str,
+    name: str,
+    inputs: list[str],
+    env: list[str],
+    schedule: dict | None = None,
+) -> int:
     today = date.today()
-    payload = store.load_or_create(today)
     text = name.strip() or task_cmd.strip()
-    payload = add_task(payload, text=text, command=task_cmd)
-    store.save(today, payload)
-    task = payload["tasks"][-1]
-    print(f"Added task #{task['id']}: {text}")
-    print(f"Command: {task.get('command')}")
+    task = store.add_task(today, text=text, command=task_cmd, inputs=inputs, env=env, schedule=schedule)
+    print(f"Added task #{task.id}: {text}")
+    print(f"Command: {task.command}")
+    if task.inputs:
+        print(f"Inputs: {', '.join(task.inputs)}")
     return 0
 
 
 def cmd_note(store: DailyStore, text: str) -> int:
-    today = date.today()
-    payload = store.load_or_create(today)
-    payload = add_note(payload, text)
-    store.save(today, payload)
+    store.add_note(date.today(), text)
     print("Note captured")
     return 0
 
 
 def cmd_done(store: DailyStore, task_id: int) -> int:
-    today = date.today()
-    payload = store.load_or_create(today)
-    payload, found = mark_done(payload, task_id)
-    if not found:
+    if not store.mark_done(date.today(), task_id):
         print(f"Task {task_id} not found")
         return 1
-    store.save(today, payload)
     print(f"Task {task_id} marked done")
     return 0
 
 
 def cmd_list(store: DailyStore) -> int:
     payload = store.load_or_create(date.today())
-    print(list_tasks(payload))
+    print(list_tasks(payload, store.history))
     return 0
 
 
-def cmd_run(store: DailyStore, limit: int, timeout: int) -> int:
-    today = date.today()
-    payload = store.load_or_create(today)
-    run_all = limit <= 0
-    payload, results = execute_pending_commands(
-        payload,
-        cwd=Path.cwd(),
-        run_all=run_all,
-        limit=max(limit, 1) if not run_all else 1,
-        timeout_seconds=max(timeout, 1),
-    )
-    store.save(today, payload)
+def run_capacity(jobs: int, max_load: float, min_free_mb: int | None) -> Capacity | None:
+    # A plain sequential run starts its task right away; admission control is for --jobs or when asked for.
+    if jobs <= 1 and max_load <= 0 and min_free_mb is None:
+        return None
+    capacity = Capacity() if min_free_mb is None else Capacity(min_free_mb=min_free_mb)
+    if max_load > 0:
+        capacity.max_load = max_load
+    return capacity
+
+
+def run_and_report(
+    store: DailyStore,
+    today: date,
+    payload: Day,
+    run_all: bool,
+    limit: int,
+    timeout: int,
+    compress_logs: bool,
+    use_cache: bool,
+    task_ids: set[int] | None = None,
+    jobs: int = 1,
+    capacity: Capacity | None = None,
+    workspaces: WorktreePool | None = None,
+) -> int | None:
+    logs = store.run_logs(compress=compress_logs)
+    cache = store.result_cache() if use_cache else None
+    try:
+        # Every state transition is persisted as it happens, so there is no final save.
+        payload, results = execute_pending_commands(
+            payload,
+            cwd=Path.cwd(),
+            run_all=run_all,
+            limit=limit,
+            timeout_seconds=max(timeout, 1),
+            logs=logs,
+            on_update=lambda task: store.update_task(today, task),
+            cache=cache,
+            task_ids=task_ids,
+            jobs=jobs,
+            capacity=capacity,
+            workspaces=workspaces,
+            claim=lambda task: store.claim_task(today, task.id),
+        )
+    except KeyboardInterrupt:
+        print("Run interrupted; unfinished task requeued, completed tasks kept")
+        return 130
+    finally:
+        if cache is not None:
+            cache.flush()
+        if workspaces is not None:
+            workspaces.prune()
+    logs.prune(today)
 
     if not results:
-        print("No pending command tasks to run")
-        return 0
+        return None
 
     failures = 0
     for result in results:
+        detail = " [cached]" if result.get("cached") else ""
+        if "duration_s" in result:
+            detail = f" in {format_seconds(result['duration_s'])}"
         print(
-            f"Task {result['id']}: {result['status']} (rc={result['returncode']}) - {result['text']}"
+            f"Task {result['id']}: {result['status']} (rc={result['returncode']}){detail} - {result['text']}"
         )
         if result["status"] != "done":
             failures += 1
+            log_path = result.get("log_path")
+            if log_path:
+                print(f"  Log: {log_path}")
 
     return 1 if failures else 0
 
 
-def cmd_review(store: DailyStore) -> int:
+def cmd_run(
+    store: DailyStore,
+    limit: int,
+    timeout: int,
+    compress_logs: bool = False,
+    use_cache: bool = True,
+    jobs: int = 1,
+    capacity: Capacity | None = None,
+    isolate: bool = False,
+    pool_size: int = 0,
+) -> int:
+    workspaces = None
+    if isolate:
+        repo = repo_root(Path.cwd())
+        if repo is None:
+            print("--isolate needs to run inside a git repository")
+            return 2
+        workspaces = store.worktree_pool(repo, max_size=pool_size or jobs)
+
     today = date.today()
     payload = store.load_or_create(today)
-    report = build_review(payload, Path.cwd())
+    requeue_interrupted(store, today, payload)
+    run_all = limit <= 0
+    code = run_and_report(
+        store,
+        today,
+        payload,
+        run_all=run_all,
+        limit=max(limit, 1) if not run_all else 1,
+        timeout=timeout,
+        compress_logs=compress_logs,
+        use_cache=use_cache,
+        jobs=jobs,
+        capacity=capacity,
+        workspaces=workspaces,
+    )
+    for task in payload.tasks:
+        if task.status != "failed":
+            continue
+        if retries_exhausted(task):
+            print(f"Task {task.id}: gave up after {task.attempts} attempt(s) - {task.text}")
+        elif task.next_attempt_at:
+            print(f"Task {task.id}: next retry after {task.next_attempt_at} - {task.text}")
+    if code is None:
+        print("No pending command tasks to run")
+        return 0
+    return code
+
+
+def cmd_watch(
+    store: DailyStore,
+    interval: float,
+    debounce: float,
+    timeout: int,
+    compress_logs: bool = False,
+    use_cache: bool = True,
+) -> int:
+    root = Path.cwd()
+
+    def input_patterns() -> list[str]:
+        payload = store.load_or_create(date.today())
+        return [pattern for task in payload.tasks for pattern in task.inputs]
+
+    def on_batch(changed: set[str]) -> None:
+        today = date.today()
+        payload = store.load_or_create(today)
+        tasks = affected_tasks(payload, changed)
+        if not tasks:
+            return
+        print(f"{len(changed)} file(s) changed; re-running {len(tasks)} task(s)")
+        for task in tasks:
+            if task.status == "running":
+                continue
+            task.status = "pending"
+            store.update_task(today, task)
+        code = run_and_report(
+            store,
+            today,
+            payload,
+            run_all=True,
+            limit=1,
+            timeout=timeout,
+            compress_logs=compress_logs,
+            use_cache=use_cache,
+            task_ids={task.id for task in tasks},
+        )
+        if code == 130:
+            raise KeyboardInterrupt
+
+    if not input_patterns():
+        print("No tasks declare --input globs; nothing to watch")
+        return 1
+
+    print(f"Watching {root} for changes (Ctrl-C to stop)")
+    try:
+        watch_changes(root, input_patterns, on_batch, interval=max(interval, 0.05), debounce=max(debounce, 0.0))
+    except KeyboardInterrupt:
+        print("Watch stopped")
+    return 0
+
+
+def cmd_history(
+    store: DailyStore,
+    days: int,
+    match: str,
+    slowest: int,
+    trend: bool,
+    rebuild: bool,
+    compact_before: date | None,
+) -> int:
+    if rebuild:
+        print(f"Indexed {store.rebuild_history()} day(s)")
+    if compact_before is not None:
+        try:
+            archived = store.compact(compact_before)
+        except ValueError as exc:
+            print(exc)
+            return 1
+        print(f"Archived {len(archived)} day file(s) older than {compact_before.isoformat()}")
+
+    since = date.today() - timedelta(days=max(days, 1) - 1)
+    print(render_history(store.history, since.isoformat(), match=match, slowest=slowest, trend=trend))
+    return 0
+
+
+def cmd_review(store: DailyStore, repos: list[Path] | None = None) -> int:
+    try:
+        workspaces = store.workspace_repos() + list(repos or [])
+    except ValueError as exc:
+        print(exc)
+        return 1
+    today = date.today()
+    payload = store.load_or_create(today)
+    cwd = Path.cwd()
+    snapshots = collect_snapshots(review_repos(cwd, workspaces), cache=store.snapshot_cache())
+    report = build_review(payload, cwd, store.history, snapshots)
     output = store.reports_dir() / f"{today.isoformat()}-review.md"
     output.write_text(report, encoding="utf-8")
     print(f"Review saved: {output}")
@@ -138,7 +380,8 @@ def main() -> int:
     if args.command == "start":
         return cmd_start(store)
     if args.command == "add":
-        return cmd_add(store, args.task_cmd, args.name)
+        schedule = schedule_fields(args.priority, args.cpu, args.mem_mb, args.retries, args.backoff)
+        return cmd_add(store, args.task_cmd, args.name, args.inputs, args.env, schedule)
     if args.command == "note":
         return cmd_note(store, args.text)
     if args.command == "done":
@@ -146,9 +389,28 @@ def main() -> int:
     if args.command == "list":
         return cmd_list(store)
     if args.command == "run":
-        return cmd_run(store, args.limit, args.timeout)
+        capacity = run_capacity(args.jobs, args.max_load, args.min_free_mb)
+        return cmd_run(
+            store,
+            args.limit,
+            args.timeout,
+            args.compress_logs,
+            not args.no_cache,
+            jobs=max(args.jobs, 1),
+            capacity=capacity,
+            isolate=args.isolate,
+            pool_size=max(args.pool_size, 0),
+        )
+    if args.command == "watch":
+        return cmd_watch(
+            store, args.interval, args.debounce, args.timeout, args.compress_logs, not args.no_cache
+        )
+    if args.command == "history":
+        return cmd_history(
+            store, args.days, args.match, args.slowest, args.trend, args.rebuild, args.compact_before
+        )
     if args.command == "review":
-        return cmd_review(store)
+        return cmd_review(store, args.repos)
 
     return 1
 
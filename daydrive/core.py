@@ -2,22 +2,45 @@ from __future__ import annotations
 
 import json
 import os
-import subprocess
-from dataclasses import dataclass
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import date, datetime
 from pathlib import Path
+from typing import Callable
+
+from .cache import ResultCache
+from .history import HistoryIndex, TimingProfile, cpu_seconds, format_seconds
+from .logs import CapturedRun, RunLogs, run_streaming
+from .model import Day, Note, Task, normalize_payload, now_iso
+from .scheduler import Capacity, Scheduler, eligible, schedule_retry
+from .snapshots import SnapshotCache, collect_snapshots, find_repo
+from .storage import StorageBackend, empty_day, open_backend
+from .worktrees import WorktreePool
+
+SCHEDULER_POLL_S = 0.25
 
 
 @dataclass
 class DailyStore:
     base_dir: Path
+    storage: str = "json"
+    backend: StorageBackend = field(init=False, repr=False)
+    history: HistoryIndex = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.backend = open_backend(self.storage, self.base_dir)
+        self.history = HistoryIndex(self.base_dir / "history.sqlite")
 
     @classmethod
     def from_env(cls) -> "DailyStore":
         root = os.environ.get("DAYDRIVE_HOME", "")
+        storage = os.environ.get("DAYDRIVE_STORAGE", "") or "json"
         if root:
-            return cls(Path(root).expanduser())
-        return cls(Path.home() / ".daydrive")
+            return cls(Path(root).expanduser(), storage=storage)
+        return cls(Path.home() / ".daydrive", storage=storage)
 
     def day_path(self, day: date) -> Path:
         return self.base_dir / "days" / f"{day.isoformat()}.json"
@@ -25,227 +48,501 @@ class DailyStore:
     def reports_dir(self) -> Path:
         return self.base_dir / "reports"
 
-    def ensure(self) -> None:
-        (self.base_dir / "days").mkdir(parents=True, exist_ok=True)
-        self.reports_dir().mkdir(parents=True, exist_ok=True)
-
-    def load_or_create(self, day: date) -> dict:
-        self.ensure()
-        path = self.day_path(day)
-        if path.exists():
-            payload = json.loads(path.read_text(encoding="utf-8"))
-            normalize_payload(payload)
-            return payload
-
-        payload = {
-            "date": day.isoformat(),
-            "tasks": [],
-            "notes": [],
-            "created_at": datetime.now().isoformat(timespec="seconds"),
-            "updated_at": datetime.now().isoformat(timespec="seconds"),
-        }
-        self.save(day, payload)
-        return payload
-
-    def save(self, day: date, payload: dict) -> None:
-        payload["updated_at"] = datetime.now().isoformat(timespec="seconds")
-        self.day_path(day).write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+    def logs_dir(self) -> Path:
+        return self.base_dir / "logs"
 
+    def run_logs(self, compress: bool = False) -> RunLogs:
+        return RunLogs(self.logs_dir(), compress=compress)
 
-def normalize_payload(payload: dict) -> dict:
-    payload.setdefault("tasks", [])
-    payload.setdefault("notes", [])
+    def result_cache(self) -> ResultCache:
+        return ResultCache(self.base_dir / "cache")
 
-    for task in payload["tasks"]:
-        task.setdefault("kind", "manual")
-        task.setdefault("command", "")
+    def worktree_pool(self, repo: Path, max_size: int) -> WorktreePool:
+        return WorktreePool(repo, self.base_dir / "worktrees", max_size=max_size)
 
-        done_flag = bool(task.get("done", False))
-        if "status" not in task:
-            task["status"] = "done" if done_flag else "pending"
+    def snapshot_cache(self) -> SnapshotCache:
+        return SnapshotCache(self.base_dir / "cache" / "git-snapshots.json")
 
-        # Keep backward-compatibility with old structure.
-        task["done"] = task["status"] == "done"
-        task.setdefault("created_at", datetime.now().isoformat(timespec="seconds"))
+    def config_path(self) -> Path:
+        return self.base_dir / "config.json"
 
-    return payload
+    def workspace_repos(self) -> list[Path]:
+        path = self.config_path()
+        if not path.exists():
+            return []
+        try:
+            config = json.loads(path.read_text(encoding="utf-8"))
+        except ValueError as exc:
+            raise ValueError(f"Invalid {path}: {exc}") from exc
+        return [Path(entry).expanduser() for entry in config.get("workspaces", [])]
 
+    def ensure(self) -> None:
+        (self.base_dir / "days").mkdir(parents=True, exist_ok=True)
+        self.reports_dir().mkdir(parents=True, exist_ok=True)
 
-def add_task(payload: dict, text: str, command: str = "") -> dict:
-    normalize_payload(payload)
-    next_id = max((task["id"] for task in payload["tasks"]), default=0) + 1
+    def load_or_create(self, day: date) -> Day:
+        self.ensure()
+        payload = self.backend.load(day)
+        if payload is None:
+            payload = self.backend.create_day(day, empty_day(day))
+        return Day.from_dict(payload)
+
+    def save(self, day: date, payload: Day) -> None:
+        payload.updated_at = now_iso()
+        self.backend.save(day, payload.to_dict())
+        self.history.record_day(day.isoformat(), payload)
+
+    def add_task(
+        self,
+        day: date,
+        text: str,
+        command: str = "",
+        inputs: list[str] | None = None,
+        env: list[str] | None = None,
+        schedule: dict | None = None,
+    ) -> Task:
+        self.ensure()
+        data = self.backend.insert_task(
+            day, lambda task_id: new_task(task_id, text, command, inputs, env, schedule).to_dict()
+        )
+        return Task.from_dict(data)
 
-    command_text = command.strip() or text.strip()
+    def add_note(self, day: date, text: str) -> Note:
+        self.ensure()
+        note = new_note(text)
+        self.backend.insert_note(day, note.to_dict())
+        return note
 
-    payload["tasks"].append(
+    def mark_done(self, day: date, task_id: int) -> bool:
+        self.ensure()
+        return self.backend.modify_task(day, task_id, _set_done) is not None
+
+    def claim_task(self, day: date, task_id: int) -> Task | None:
+        claimed: list[Task] = []
+
+        def claim(data: dict) -> None:
+            # Compare-and-set on the stored task: another runner or the user may have moved it on since our load.
+            task = Task.from_dict(data)
+            if task.kind != "command" or not eligible(task, datetime.now()):
+                return
+            task.start(runner_identity())
+            data.update(task.to_dict())
+            claimed.append(task)
+
+        self.backend.modify_task(day, task_id, claim)
+        return claimed[0] if claimed else None
+
+    def update_task(self, day: date, task: Task) -> None:
+        self.backend.put_task(day, task.to_dict())
+        self.history.record_task(day.isoformat(), task)
+
+    def rebuild_history(self) -> int:
+        days = self.backend.days()
+        for day in days:
+            payload = self.backend.load(day)
+            if payload is not None:
+                self.history.record_day(day.isoformat(), Day.from_dict(payload))
+        return len(days)
+
+    def compact(self, before: date) -> list[date]:
+        compact = getattr(self.backend, "compact", None)
+        if compact is None:
+            raise ValueError(f"The {self.backend.name} backend keeps no day files to compact")
+        archived = compact(before)
+        for day in archived:
+            # Archived days still load, so index them from where they now live.
+            payload = self.backend.load(day)
+            if payload is not None:
+                self.history.record_day(day.isoformat(), Day.from_dict(payload))
+        return archived
+
+
+def new_task(
+    task_id: int,
+    text: str,
+    command: str = "",
+    inputs: list[str] | None = None,
+    env: list[str] | None = None,
+    schedule: dict | None = None,
+) -> Task:
+    return Task.from_dict(
         {
-            "id": next_id,
+            "id": task_id,
             "text": text.strip(),
             "kind": "command",
-            "command": command_text,
-            "status": "pending",
-            "done": False,
-            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "command": command.strip() or text.strip(),
+            "created_at": now_iso(),
+            "inputs": inputs or [],
+            "env": env or [],
+            **(schedule or {}),
         }
     )
+
+
+def new_note(text: str) -> Note:
+    return Note(text=text.strip(), created_at=now_iso())
+
+
+def add_task(
+    payload: Day,
+    text: str,
+    command: str = "",
+    inputs: list[str] | None = None,
+    env: list[str] | None = None,
+    schedule: dict | None = None,
+) -> Day:
+    payload.add(new_task(payload.next_id(), text, command, inputs, env, schedule))
     return payload
 
 
-def add_note(payload: dict, text: str) -> dict:
-    payload.setdefault("notes", [])
-    payload["notes"].append(
-        {
-            "text": text.strip(),
-            "created_at": datetime.now().isoformat(timespec="seconds"),
-        }
-    )
+def add_note(payload: Day, text: str) -> Day:
+    payload.notes.append(new_note(text))
     return payload
 
 
-def mark_done(payload: dict, task_id: int) -> tuple[dict, bool]:
-    normalize_payload(payload)
-    for task in payload["tasks"]:
-        if task["id"] == task_id:
-            task["status"] = "done"
-            task["done"] = True
-            task["done_at"] = datetime.now().isoformat(timespec="seconds")
-            return payload, True
-    return payload, False
+def _set_done(data: dict) -> None:
+    # Storage backends hand over the raw stored task; route it through the model so both paths agree.
+    task = Task.from_dict(data)
+    task.mark_done()
+    data.update(task.to_dict())
+
+
+def mark_done(payload: Day, task_id: int) -> tuple[Day, bool]:
+    task = payload.get(task_id)
+    if task is None:
+        return payload, False
+    task.mark_done()
+    return payload, True
+
 
+def summarize_tasks(payload: Day) -> tuple[int, int]:
+    done = sum(1 for task in payload.tasks if task.done)
+    return done, len(payload.tasks)
 
-def summarize_tasks(payload: dict) -> tuple[int, int]:
-    normalize_payload(payload)
-    total = len(payload["tasks"])
-    done = len([task for task in payload["tasks"] if task["status"] == "done"])
-    return done, total
 
+def timing_summary(task: Task, profile: TimingProfile | None) -> str:
+    last_run = task.last_run or {}
+    parts = []
+    if last_run.get("duration_s") is not None and not last_run.get("cached"):
+        parts.append(f"last {format_seconds(last_run['duration_s'])}")
+    if profile is not None:
+        parts.append(f"p50 {format_seconds(profile.p50_s)}")
+        parts.append(f"p95 {format_seconds(profile.p95_s)}")
+        if profile.regression:
+            parts.append("REGRESSION")
+    return ", ".join(parts)
 
-def list_tasks(payload: dict) -> str:
-    normalize_payload(payload)
-    if not payload["tasks"]:
+
+def list_tasks(payload: Day, history: HistoryIndex | None = None) -> str:
+    if not payload.tasks:
         return "No tasks yet. Add one with: daydrive add \"echo hello\""
 
     icons = {"pending": " ", "running": "~", "done": "x", "failed": "!"}
+    commands = [task for task in payload.tasks if task.kind == "command"]
+    profiles = history.timing_profiles(commands) if history is not None else {}
     lines = []
-    for task in payload["tasks"]:
-        status = task.get("status", "pending")
-        icon = icons.get(status, " ")
+    for task in payload.tasks:
+        icon = icons.get(task.status, " ")
         suffix = ""
-        if task.get("kind") == "command":
+        if task.kind == "command":
             suffix = " [command]"
-        lines.append(f"[{icon}] {task['id']}. {task['text']}{suffix}")
+            timing = timing_summary(task, profiles.get(task.id))
+            if timing:
+                suffix += f" ({timing})"
+        lines.append(f"[{icon}] {task.id}. {task.text}{suffix}")
     return "\n".join(lines)
 
 
+def _process_start_token(pid: int) -> str:
+    # Start time in clock ticks since boot; distinguishes a live runner from a reused PID.
+    try:
+        stat = Path(f"/proc/{pid}/stat").read_text(encoding="utf-8")
+    except OSError:
+        return ""
+    fields = stat.rsplit(")", 1)[-1].split()
+    return fields[19] if len(fields) > 19 else ""
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def runner_identity() -> dict:
+    pid = os.getpid()
+    return {"pid": pid, "started": _process_start_token(pid), "host": socket.gethostname()}
+
+
+def runner_alive(runner: dict | None) -> bool:
+    if not runner or runner.get("host") != socket.gethostname():
+        return False
+    pid = int(runner.get("pid", 0))
+    if pid <= 0 or not _pid_alive(pid):
+        return False
+    started = runner.get("started", "")
+    return not started or started == _process_start_token(pid)
+
+
+def recover_orphaned_tasks(payload: Day) -> list[Task]:
+    recovered = []
+    for task in payload.tasks:
+        if task.status != "running":
+            continue
+        if runner_alive(task.runner):
+            continue
+        task.requeue("runner exited before the task finished")
+        recovered.append(task)
+    return recovered
+
+
+def _from_cache(task: Task, hit: dict) -> dict:
+    task.runner = None
+    task.mark_done()
+    task.attempts = 0
+    task.next_attempt_at = ""
+    task.last_run = {
+        "returncode": hit["returncode"],
+        "stdout_tail": hit["stdout_tail"],
+        "stderr_tail": hit["stderr_tail"],
+        "finished_at": task.done_at,
+        "cached": True,
+    }
+    if hit.get("log_path"):
+        task.last_run["log_path"] = hit["log_path"]
+    return {
+        "id": task.id,
+        "text": task.text,
+        "returncode": hit["returncode"],
+        "status": "done",
+        "log_path": hit.get("log_path", ""),
+        "cached": True,
+    }
+
+
 def execute_pending_commands(
-    payload: dict,
+    payload: Day,
     cwd: Path,
     run_all: bool = False,
     limit: int = 1,
     timeout_seconds: int = 600,
-) -> tuple[dict, list[dict]]:
-    normalize_payload(payload)
+    logs: RunLogs | None = None,
+    on_update: Callable[[Task], None] | None = None,
+    cache: ResultCache | None = None,
+    task_ids: set[int] | None = None,
+    jobs: int = 1,
+    capacity: Capacity | None = None,
+    workspaces: WorktreePool | None = None,
+    claim: Callable[[Task], Task | None] | None = None,
+) -> tuple[Day, list[dict]]:
     results: list[dict] = []
-    executed = 0
-
-    for task in payload["tasks"]:
-        if task.get("kind") != "command":
-            continue
-        if task.get("status") not in {"pending", "failed"}:
-            continue
-        if not task.get("command"):
-            continue
-
-        if not run_all and executed >= limit:
-            break
-
-        task["status"] = "running"
-        task["started_at"] = datetime.now().isoformat(timespec="seconds")
-
+    day = payload.date or date.today().isoformat()
+    update_lock = threading.Lock()
+    cache_lock = threading.Lock()
+    cancel = threading.Event()
+
+    def checkpoint(task: Task) -> None:
+        if on_update is not None:
+            with update_lock:
+                on_update(task)
+
+    def start(task: Task) -> bool:
+        if claim is None:
+            task.start(runner_identity())
+            checkpoint(task)
+            return True
+        claimed = claim(task)
+        if claimed is None:
+            return False
+        task.status, task.started_at, task.runner, task.attempts = (
+            claimed.status,
+            claimed.started_at,
+            claimed.runner,
+            claimed.attempts,
+        )
+        return True
+
+    def run_one(task: Task, cache_key: str) -> dict:
+        slot = None
         try:
-            proc = subprocess.run(
-                task["command"],
-                shell=True,
-                cwd=cwd,
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=timeout_seconds,
-            )
-            stdout_tail = "\n".join(proc.stdout.splitlines()[-20:]).strip()
-            stderr_tail = "\n".join(proc.stderr.splitlines()[-20:]).strip()
-
-            ok = proc.returncode == 0
-            task["status"] = "done" if ok else "failed"
-            task["done"] = ok
-            if ok:
-                task["done_at"] = datetime.now().isoformat(timespec="seconds")
-
-            task["last_run"] = {
-                "returncode": proc.returncode,
-                "stdout_tail": stdout_tail,
-                "stderr_tail": stderr_tail,
-                "finished_at": datetime.now().isoformat(timespec="seconds"),
-            }
-            results.append(
-                {
-                    "id": task["id"],
-                    "text": task["text"],
-                    "returncode": proc.returncode,
-                    "status": task["status"],
-                }
-            )
-        except subprocess.TimeoutExpired:
-            task["status"] = "failed"
-            task["done"] = False
-            task["last_run"] = {
-                "returncode": -1,
-                "stdout_tail": "",
-                "stderr_tail": f"Command timed out after {timeout_seconds}s",
-                "finished_at": datetime.now().isoformat(timespec="seconds"),
-            }
-            results.append(
-                {
-                    "id": task["id"],
-                    "text": task["text"],
-                    "returncode": -1,
-                    "status": "failed",
-                }
+            workdir = cwd
+            if workspaces is not None:
+                slot = workspaces.acquire()
+                workdir = workspaces.workdir(slot, cwd)
+                if cache is not None:
+                    # Key on the tree the command sees: HEAD plus tracked changes, without untracked files.
+                    with cache_lock:
+                        cache_key = cache.key_for(task, cwd, tree=workdir)
+                        hit = cache.lookup(cache_key) if cache_key else None
+                    if hit is not None:
+                        result = _from_cache(task, hit)
+                        checkpoint(task)
+                        return result
+            log_path = logs.path_for(day, task.id) if logs is not None else None
+            captured = run_streaming(
+                task.command,
+                cwd=workdir,
+                timeout_seconds=timeout_seconds,
+                logs=logs,
+                log_path=log_path,
+                cancel=cancel,
             )
+        except RuntimeError as exc:
+            # Worktree setup failed; report it on the task rather than aborting the whole run.
+            captured = CapturedRun(-1, "", f"Worktree setup failed: {exc}", False, "")
+        except BaseException:
+            task.requeue("run interrupted")
+            checkpoint(task)
+            raise
+        finally:
+            if slot is not None:
+                workspaces.release(slot)
+
+        ok = captured.returncode == 0 and not captured.timed_out
+        task.runner = None
+        if ok:
+            task.mark_done()
+            task.attempts = 0
+            task.next_attempt_at = ""
+        else:
+            task.status = "failed"
+            schedule_retry(task, datetime.now())
+
+        last_run = {
+            "returncode": captured.returncode,
+            "stdout_tail": captured.stdout_tail,
+            "stderr_tail": captured.stderr_tail,
+            "finished_at": now_iso(),
+            "duration_s": round(captured.duration_s, 3),
+        }
+        if captured.cpu_user_s is not None:
+            last_run["cpu_user_s"] = round(captured.cpu_user_s, 3)
+            last_run["cpu_sys_s"] = round(captured.cpu_sys_s, 3)
+        if captured.max_rss_kb is not None:
+            last_run["max_rss_kb"] = captured.max_rss_kb
+        if captured.log_path:
+            last_run["log_path"] = captured.log_path
+        if slot is not None:
+            last_run["worktree"] = slot.name
+        task.last_run = last_run
+        if ok and cache_key:
+            with cache_lock:
+                cache.store(cache_key, task.command, last_run)
+        checkpoint(task)
+        return {
+            "id": task.id,
+            "text": task.text,
+            "returncode": captured.returncode,
+            "status": task.status,
+            "log_path": captured.log_path,
+            "duration_s": captured.duration_s,
+        }
 
-        executed += 1
+    now = datetime.now()
+    candidates = [
+        task
+        for task in payload.tasks
+        if task.kind == "command"
+        and (task_ids is None or task.id in task_ids)
+        and task.command
+        and eligible(task, now)
+    ]
+    scheduler = Scheduler(candidates, capacity)
+    if workspaces is not None and candidates:
+        workspaces.prepare()
+    running: dict[Future, Task] = {}
+    executed = 0
+    jobs = max(jobs, 1)
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        try:
+            while scheduler or running:
+                while scheduler and len(running) < jobs and (run_all or executed < limit):
+                    task = scheduler.next_task(list(running.values()))
+                    if task is None:
+                        break
+                    if not start(task):
+                        # Already running elsewhere, or no longer eligible in storage.
+                        continue
+                    # Hash inputs before running, since the command itself may rewrite them. Isolated
+                    # tasks are hashed in their worktree instead, once run_one has one.
+                    cache_key = cache.key_for(task, cwd) if cache is not None and workspaces is None else ""
+                    hit = cache.lookup(cache_key) if cache_key else None
+                    if hit is not None:
+                        results.append(_from_cache(task, hit))
+                        checkpoint(task)
+                        continue
+                    running[pool.submit(run_one, task, cache_key)] = task
+                    executed += 1
+
+                if not run_all and executed >= limit:
+                    scheduler.queue.clear()
+                if running:
+                    finished, _ = wait(running, timeout=SCHEDULER_POLL_S, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        running.pop(future)
+                        results.append(future.result())
+                elif scheduler:
+                    # Everything left is waiting for load or memory to drop.
+                    time.sleep(SCHEDULER_POLL_S)
+        except BaseException:
+            cancel.set()
+            wait(running)
+            raise
 
     return payload, results
 
 
-def _run_git(cwd: Path, args: list[str]) -> str:
-    proc = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=False)
-    if proc.returncode != 0:
-        return ""
-    return proc.stdout.strip()
+def git_snapshot(cwd: Path) -> dict:
+    return collect_snapshots([cwd])[cwd]
 
 
-def git_snapshot(cwd: Path) -> dict:
-    branch = _run_git(cwd, ["branch", "--show-current"])
-    status = _run_git(cwd, ["status", "--porcelain"])
-    commit_lines = _run_git(cwd, ["log", "--since=midnight", "--oneline", "--max-count", "5"])
-    return {
-        "branch": branch or "n/a",
-        "dirty_files": len([line for line in status.splitlines() if line.strip()]),
-        "today_commits": [line for line in commit_lines.splitlines() if line.strip()],
-    }
+def _snapshot_lines(git: dict) -> list[str]:
+    lines = [
+        f"- Branch: {git['branch']}",
+        f"- Dirty files: {git['dirty_files']}",
+        f"- Commits since midnight: {len(git['today_commits'])}",
+    ]
+    if git["today_commits"]:
+        lines.append("- Recent commits:")
+        for line in git["today_commits"]:
+            lines.append(f"  - {line}")
+    return lines
+
+
+def review_repos(cwd: Path, workspaces: list[Path]) -> list[Path]:
+    # The current repo leads; outside a repo it is only reviewed when no workspaces are configured.
+    current = find_repo(cwd)
+    candidates = ([current or cwd] if current is not None or not workspaces else []) + list(workspaces)
+    repos: list[Path] = []
+    seen: set[Path] = set()
+    for path in candidates:
+        resolved = path.resolve()
+        if resolved not in seen:
+            seen.add(resolved)
+            repos.append(resolved)
+    return repos
 
 
-def build_review(payload: dict, cwd: Path) -> str:
-    normalize_payload(payload)
+def build_review(
+    payload: Day,
+    cwd: Path,
+    history: HistoryIndex | None = None,
+    snapshots: dict[Path, dict] | None = None,
+) -> str:
     done, total = summarize_tasks(payload)
-    open_tasks = [task for task in payload["tasks"] if task["status"] in {"pending", "running"}]
-    failed_tasks = [task for task in payload["tasks"] if task["status"] == "failed"]
-    notes = payload["notes"]
-    git = git_snapshot(cwd)
+    open_tasks = [task for task in payload.tasks if task.status in {"pending", "running"}]
+    failed_tasks = [task for task in payload.tasks if task.status == "failed"]
+    notes = payload.notes
+    if snapshots is None:
+        snapshots = {cwd: git_snapshot(cwd)}
 
     lines = [
-        f"# DayDrive Review - {payload['date']}",
+        f"# DayDrive Review - {payload.date}",
         "",
         "## Task Completion",
         f"- Completed: {done}/{total}",
@@ -256,35 +553,55 @@ def build_review(payload: dict, cwd: Path) -> str:
     ]
 
     if open_tasks:
-        lines.extend([f"- {task['id']}. {task['text']}" for task in open_tasks])
+        lines.extend([f"- {task.id}. {task.text}" for task in open_tasks])
     else:
         lines.append("- None")
 
     lines.extend(["", "## Failed Task Runs"])
     if failed_tasks:
         for task in failed_tasks:
-            error = task.get("last_run", {}).get("stderr_tail", "")
-            lines.append(f"- {task['id']}. {task['text']} ({error or 'no stderr captured'})")
+            last_run = task.last_run or {}
+            error = last_run.get("stderr_tail", "")
+            lines.append(f"- {task.id}. {task.text} ({error or 'no stderr captured'})")
+            if last_run.get("log_path"):
+                lines.append(f"  - Full log: {last_run['log_path']}")
+    else:
+        lines.append("- None")
+
+    lines.extend(["", "## Run Timings"])
+    timed = [task for task in payload.tasks if (task.last_run or {}).get("duration_s") is not None]
+    if timed:
+        profiles = history.timing_profiles(timed) if history is not None else {}
+        for task in sorted(timed, key=lambda item: item.last_run["duration_s"], reverse=True):
+            last_run = task.last_run
+            details = [timing_summary(task, profiles.get(task.id))]
+            cpu = cpu_seconds(last_run)
+            if cpu is not None:
+                details.append(f"cpu {format_seconds(cpu)}")
+            if last_run.get("max_rss_kb") is not None:
+                details.append(f"peak rss {last_run['max_rss_kb'] / 1024:.0f} MB")
+            lines.append(f"- {task.id}. {task.text}: {', '.join(details)}")
     else:
         lines.append("- None")
 
     lines.extend(["", "## Notes Captured"])
     if notes:
-        lines.extend([f"- {note['text']}" for note in notes[-8:]])
+        lines.extend([f"- {note.text}" for note in notes[-8:]])
     else:
         lines.append("- None")
 
-    lines.extend([
-        "",
-        "## Git Snapshot",
-        f"- Branch: {git['branch']}",
-        f"- Dirty files: {git['dirty_files']}",
-        f"- Commits since midnight: {len(git['today_commits'])}",
-    ])
-
-    if git["today_commits"]:
-        lines.append("- Recent commits:")
-        for line in git["today_commits"]:
-            lines.append(f"  - {line}")
+    lines.extend(["", "## Git Snapshot"])
+    if len(snapshots) == 1:
+        lines.extend(_snapshot_lines(next(iter(snapshots.values()))))
+    else:
+        dirty_repos = [git for git in snapshots.values() if git["dirty_files"]]
+        lines.extend([
+            f"- Repositories: {len(snapshots)}",
+            f"- Dirty files: {sum(git['dirty_files'] for git in dirty_repos)} in {len(dirty_repos)} repo(s)",
+            f"- Commits since midnight: {sum(len(git['today_commits']) for git in snapshots.values())}",
+        ])
+        for repo, git in snapshots.items():
+            lines.extend(["", f"### {repo.name or repo}"])
+            lines.extend(_snapshot_lines(git))
 
     return "\n".join(lines) + "\n"
@@ -0,0 +1,336 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from .model import Day, Task
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    day TEXT NOT NULL,
+    task_id INTEGER NOT NULL,
+    finished_at TEXT NOT NULL,
+    command TEXT NOT NULL,
+    text TEXT NOT NULL,
+    status TEXT NOT NULL,
+    returncode INTEGER NOT NULL,
+    duration_s REAL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    cpu_s REAL,
+    max_rss_kb INTEGER,
+    PRIMARY KEY (day, task_id, finished_at)
+);
+CREATE INDEX IF NOT EXISTS runs_command ON runs (command, day);
+CREATE INDEX IF NOT EXISTS runs_command_finished ON runs (command, finished_at);
+CREATE INDEX IF NOT EXISTS runs_text ON runs (text, day);
+CREATE TABLE IF NOT EXISTS daily (
+    day TEXT NOT NULL,
+    command TEXT NOT NULL,
+    text TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    failures INTEGER NOT NULL,
+    total_duration_s REAL NOT NULL,
+    max_duration_s REAL NOT NULL,
+    timed_runs INTEGER NOT NULL DEFAULT 0,
+    cached_runs INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, command, text)
+);
+CREATE INDEX IF NOT EXISTS daily_command ON daily (command, day);
+"""
+
+# Columns added after the first release of the index, applied with ALTER TABLE on open.
+ADDED_COLUMNS = {
+    "runs": {"cpu_s": "REAL", "max_rss_kb": "INTEGER"},
+    "daily": {"timed_runs": "INTEGER NOT NULL DEFAULT 0", "cached_runs": "INTEGER NOT NULL DEFAULT 0"},
+}
+
+# Cached runs never executed: they count as runs, but not towards failures or durations.
+ROLLUP = """
+INSERT INTO daily (day, command, text, runs, failures, total_duration_s, max_duration_s, timed_runs, cached_runs)
+SELECT day, command, text, COUNT(*), SUM(status = 'failed' AND cached = 0),
+       COALESCE(SUM(CASE WHEN cached = 0 THEN duration_s END), 0),
+       COALESCE(MAX(CASE WHEN cached = 0 THEN duration_s END), 0),
+       COUNT(CASE WHEN cached = 0 THEN duration_s END), SUM(cached)
+FROM runs WHERE {where}
+GROUP BY day, command, text
+"""
+
+
+def _seconds_between(start: str, end: str) -> float | None:
+    try:
+        return max((datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def run_row(day: str, task: Task) -> tuple | None:
+    last_run = task.last_run
+    if not last_run or not last_run.get("finished_at"):
+        return None
+    duration = last_run.get("duration_s")
+    if duration is None and not last_run.get("cached"):
+        duration = _seconds_between(task.started_at, last_run["finished_at"])
+    return (
+        day,
+        task.id,
+        last_run["finished_at"],
+        task.command,
+        task.text,
+        "done" if last_run.get("returncode") == 0 else "failed",
+        int(last_run.get("returncode", -1)),
+        duration,
+        1 if last_run.get("cached") else 0,
+        cpu_seconds(last_run),
+        last_run.get("max_rss_kb"),
+    )
+
+
+def cpu_seconds(last_run: dict) -> float | None:
+    if last_run.get("cpu_user_s") is None:
+        return None
+    return last_run["cpu_user_s"] + last_run.get("cpu_sys_s", 0.0)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+@dataclass
+class TimingProfile:
+    samples: int
+    p50_s: float
+    p95_s: float
+    last_s: float | None
+    regression: bool
+
+
+MIN_SAMPLES = 5
+# A run regresses when it is slower than p95 of earlier runs and at least this much over their p50.
+REGRESSION_FACTOR = 1.2
+PROFILE_SAMPLES = 200
+PROFILE_BATCH = 500
+# Sorts after any ISO timestamp: "no cutoff" for tasks without a timed last run.
+NO_CUTOFF = "~"
+
+# Recent timed runs of a batch of commands in one pass. Tasks sharing a command can compare against
+# different cutoffs, so keep every run between the earliest and latest cutoff plus the newest
+# PROFILE_SAMPLES before the earliest; each task then takes its own slice in memory.
+PROFILE_QUERY = """
+WITH wanted (command, oldest, newest) AS (VALUES {values})
+SELECT command, finished_at, duration_s FROM (
+    SELECT runs.command, runs.finished_at, runs.duration_s, wanted.oldest,
+           ROW_NUMBER() OVER (
+               PARTITION BY runs.command, runs.finished_at < wanted.oldest ORDER BY runs.finished_at DESC
+           ) AS rank
+    FROM runs JOIN wanted ON runs.command = wanted.command
+    WHERE runs.duration_s IS NOT NULL AND runs.cached = 0 AND runs.finished_at < wanted.newest
+)
+WHERE finished_at >= oldest OR rank <= ?
+ORDER BY command, finished_at DESC
+"""
+
+
+def _last_duration(task: Task) -> float | None:
+    last_run = task.last_run or {}
+    return None if last_run.get("cached") else last_run.get("duration_s")
+
+
+def _cutoff(task: Task) -> str:
+    # Compare the latest run against earlier runs only, so it cannot mask its own regression.
+    if _last_duration(task) is None:
+        return NO_CUTOFF
+    return task.last_run.get("finished_at") or NO_CUTOFF
+
+
+def build_profile(last: float | None, prior: list[float]) -> TimingProfile | None:
+    if not prior:
+        return None
+    p50, p95 = percentile(prior, 0.5), percentile(prior, 0.95)
+    regression = (
+        last is not None
+        and len(prior) >= MIN_SAMPLES
+        and last > p95
+        and last > p50 * REGRESSION_FACTOR
+    )
+    return TimingProfile(len(prior), p50, p95, last, regression)
+
+
+@dataclass
+class CommandStats:
+    command: str
+    runs: int
+    failures: int
+    total_duration_s: float
+    max_duration_s: float
+    timed_runs: int = 0
+    cached_runs: int = 0
+
+    @property
+    def failure_rate(self) -> float:
+        executed = self.runs - self.cached_runs
+        return self.failures / executed if executed else 0.0
+
+    @property
+    def mean_duration_s(self) -> float:
+        return self.total_duration_s / self.timed_runs if self.timed_runs else 0.0
+
+
+class HistoryIndex:
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            for table, columns in ADDED_COLUMNS.items():
+                present = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+                missing = [name for name in columns if name not in present]
+                for name in missing:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {columns[name]}")
+                if table == "daily" and missing:
+                    # Older rollups lack the new counts; runs has everything needed to recompute them.
+                    conn.execute("DELETE FROM daily")
+                    conn.execute(ROLLUP.format(where="1"))
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _apply(self, day: str, rows: list[tuple], keys: list[tuple[str, str]] | None) -> None:
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO runs (day, task_id, finished_at, command, text, status, "
+                    "returncode, duration_s, cached, cpu_s, max_rss_kb) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                if keys is None:
+                    conn.execute("DELETE FROM daily WHERE day = ?", (day,))
+                    conn.execute(ROLLUP.format(where="day = ?"), (day,))
+                else:
+                    for command, text in keys:
+                        params = (day, command, text)
+                        conn.execute("DELETE FROM daily WHERE day = ? AND command = ? AND text = ?", params)
+                        conn.execute(ROLLUP.format(where="day = ? AND command = ? AND text = ?"), params)
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def record_day(self, day: str, payload: Day) -> None:
+        rows = [row for row in (run_row(day, task) for task in payload.tasks) if row]
+        self._apply(day, rows, None)
+
+    def record_task(self, day: str, task: Task) -> None:
+        row = run_row(day, task)
+        if row is None:
+            return
+        self._apply(day, [row], [(row[3], row[4])])
+
+    def command_stats(self, since: str, match: str = "") -> list[CommandStats]:
+        rows = self.conn.execute(
+            "SELECT command, SUM(runs), SUM(failures), SUM(total_duration_s), MAX(max_duration_s), "
+            "SUM(timed_runs), SUM(cached_runs) FROM daily WHERE day >= ? AND (command LIKE ? OR text LIKE ?) "
+            "GROUP BY command ORDER BY SUM(runs) DESC, command",
+            (since, f"%{match}%", f"%{match}%"),
+        ).fetchall()
+        return [CommandStats(*row) for row in rows]
+
+    def daily_trend(self, since: str, match: str = "") -> list[tuple[str, int, int, int, float]]:
+        return self.conn.execute(
+            "SELECT day, SUM(runs), SUM(cached_runs), SUM(failures), SUM(total_duration_s) FROM daily "
+            "WHERE day >= ? AND (command LIKE ? OR text LIKE ?) GROUP BY day ORDER BY day",
+            (since, f"%{match}%", f"%{match}%"),
+        ).fetchall()
+
+    def slowest_runs(self, since: str, limit: int, match: str = "") -> list[tuple[str, int, str, float]]:
+        return self.conn.execute(
+            "SELECT day, task_id, command, duration_s FROM runs "
+            "WHERE day >= ? AND duration_s IS NOT NULL AND (command LIKE ? OR text LIKE ?) "
+            "ORDER BY duration_s DESC LIMIT ?",
+            (since, f"%{match}%", f"%{match}%", limit),
+        ).fetchall()
+
+    def timing_profiles(self, tasks: list[Task]) -> dict[int, TimingProfile]:
+        cutoffs: dict[str, list[str]] = {}
+        for task in tasks:
+            if task.command:
+                cutoffs.setdefault(task.command, []).append(_cutoff(task))
+        runs: dict[str, list[tuple[str, float]]] = {command: [] for command in cutoffs}
+        commands = list(cutoffs)
+        for start in range(0, len(commands), PROFILE_BATCH):
+            batch = commands[start : start + PROFILE_BATCH]
+            params = [value for command in batch for value in (command, min(cutoffs[command]), max(cutoffs[command]))]
+            query = PROFILE_QUERY.format(values=", ".join("(?, ?, ?)" for _ in batch))
+            for command, finished_at, duration in self.conn.execute(query, (*params, PROFILE_SAMPLES)):
+                runs[command].append((finished_at, duration))
+
+        profiles = {}
+        for task in tasks:
+            if not task.command:
+                continue
+            before = _cutoff(task)
+            prior = [duration for finished_at, duration in runs[task.command] if finished_at < before]
+            profile = build_profile(_last_duration(task), prior[:PROFILE_SAMPLES])
+            if profile is not None:
+                profiles[task.id] = profile
+        return profiles
+
+    def timing_profile(self, task: Task) -> TimingProfile | None:
+        return self.timing_profiles([task]).get(task.id)
+
+
+def format_seconds(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, rest = divmod(seconds, 60)
+    return f"{int(minutes)}m{int(rest):02d}s"
+
+
+def render_history(index: HistoryIndex, since: str, match: str = "", slowest: int = 0, trend: bool = False) -> str:
+    stats = index.command_stats(since, match)
+    if not stats:
+        return f"No recorded runs since {since}"
+
+    lines = [f"Runs since {since}", f"{'runs':>6} {'fail%':>6} {'avg':>8} {'max':>8}  command"]
+    for row in stats:
+        lines.append(
+            f"{row.runs:>6} {row.failure_rate * 100:>5.1f}% {format_seconds(row.mean_duration_s):>8} "
+            f"{format_seconds(row.max_duration_s):>8}  {row.command}"
+        )
+
+    if trend:
+        lines.extend(["", f"{'day':<10} {'runs':>6} {'fail%':>6} {'total':>8}"])
+        for day, runs, cached, failures, total in index.daily_trend(since, match):
+            rate = failures / (runs - cached) * 100 if runs > cached else 0.0
+            lines.append(f"{day:<10} {runs:>6} {rate:>5.1f}% {format_seconds(total):>8}")
+
+    if slowest > 0:
+        lines.extend(["", "Slowest runs"])
+        for day, task_id, command, duration in index.slowest_runs(since, slowest, match):
+            lines.append(f"- {format_seconds(duration):>8}  {day} #{task_id} {command}")
+
+    return "\n".join(lines)
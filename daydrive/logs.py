@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import gzip
+import itertools
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import IO
+
+TAIL_LINES = 20
+CHUNK_SIZE = 64 * 1024
+CANCEL_POLL_S = 0.2
+PUMP_DRAIN_S = 2.0
+
+
+class RunCancelled(Exception):
+    pass
+
+
+class RotatingLogWriter:
+    def __init__(self, path: Path, max_bytes: int, backup_count: int, compress: bool) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.compress = compress
+        self.bytes_written = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self._open(self.path)
+
+    def _open(self, path: Path) -> IO[bytes]:
+        if self.compress:
+            return gzip.open(path, "wb", compresslevel=6)
+        return path.open("wb")
+
+    def _segment(self, index: int) -> Path:
+        if index == 0:
+            return self.path
+        if self.compress:
+            # run.log.gz -> run.log.1.gz keeps the compression suffix last.
+            return self.path.with_name(f"{self.path.stem}.{index}.gz")
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def _rotate(self) -> None:
+        self._handle.close()
+        if self.backup_count <= 0:
+            self.path.unlink(missing_ok=True)
+        else:
+            for index in range(self.backup_count - 1, 0, -1):
+                source = self._segment(index)
+                if source.exists():
+                    source.replace(self._segment(index + 1))
+            self.path.replace(self._segment(1))
+        self._handle = self._open(self.path)
+        self.bytes_written = 0
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8", errors="replace")
+        if self.max_bytes > 0 and self.bytes_written and self.bytes_written + len(data) > self.max_bytes:
+            self._rotate()
+        self._handle.write(data)
+        self.bytes_written += len(data)
+
+    def close(self) -> None:
+        self._handle.close()
+
+
+@dataclass
+class RunLogs:
+    root: Path
+    compress: bool = False
+    max_bytes: int = 20 * 1024 * 1024
+    backup_count: int = 2
+    retention_days: int = 14
+
+    def path_for(self, day: str, task_id: int) -> Path:
+        stamp = datetime.now().strftime("%H%M%S")
+        suffix = ".log.gz" if self.compress else ".log"
+        folder = self.root / day
+        folder.mkdir(parents=True, exist_ok=True)
+        for attempt in itertools.count(1):
+            name = f"task-{task_id}-{stamp}" if attempt == 1 else f"task-{task_id}-{stamp}-{attempt}"
+            path = folder / f"{name}{suffix}"
+            try:
+                # Claim the name, so a rerun within the same second gets its own file.
+                path.touch(exist_ok=False)
+            except FileExistsError:
+                continue
+            return path
+
+    def open(self, path: Path) -> RotatingLogWriter:
+        return RotatingLogWriter(path, self.max_bytes, self.backup_count, self.compress)
+
+    def prune(self, today: date) -> list[Path]:
+        if self.retention_days <= 0 or not self.root.exists():
+            return []
+        cutoff = today - timedelta(days=self.retention_days)
+        removed = []
+        for folder in sorted(self.root.iterdir()):
+            try:
+                folder_day = date.fromisoformat(folder.name)
+            except ValueError:
+                continue
+            if folder.is_dir() and folder_day < cutoff:
+                shutil.rmtree(folder, ignore_errors=True)
+                removed.append(folder)
+        return removed
+
+
+@dataclass
+class CapturedRun:
+    returncode: int
+    stdout_tail: str
+    stderr_tail: str
+    timed_out: bool
+    log_path: str
+    duration_s: float = 0.0
+    cpu_user_s: float | None = None
+    cpu_sys_s: float | None = None
+    max_rss_kb: int | None = None
+
+
+class _Reaper:
+    def __init__(self, proc: subprocess.Popen) -> None:
+        self.proc = proc
+        self.usage = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        if hasattr(os, "wait4"):
+            _, status, self.usage = os.wait4(self.proc.pid, 0)
+            self.proc.returncode = os.waitstatus_to_exitcode(status)
+        else:
+            self.proc.wait()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+
+# Runs the command under `sh -c` and reports the rusage of everything it waited for. Measuring from a
+# small intermediate matters for RSS: Linux carries the spawning process's high-water mark into
+# ru_maxrss across exec, so waiting on the shell directly would report DayDrive's own peak.
+# `_signal` rather than `signal`, which would pull in enum and double the probe's startup time.
+RUSAGE_PROBE = """
+import _signal, os, resource, sys
+fd, command = int(sys.argv[1]), sys.argv[2]
+os.set_inheritable(fd, False)
+pid = os.posix_spawn("/bin/sh", ["sh", "-c", command], os.environ)
+code = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+os.write(fd, f"{usage.ru_maxrss} {usage.ru_utime} {usage.ru_stime}".encode())
+os.close(fd)
+if code < 0:
+    _signal.signal(-code, _signal.SIG_DFL)
+    os.kill(os.getpid(), -code)
+sys.exit(code)
+"""
+
+
+@dataclass
+class _Usage:
+    cpu_user_s: float | None = None
+    cpu_sys_s: float | None = None
+    max_rss_kb: int | None = None
+
+
+def _read_probe(fd: int, reaper: _Reaper) -> _Usage:
+    with os.fdopen(fd, "rb") as handle:
+        report = handle.read().decode("ascii", errors="replace").split()
+    if len(report) == 3:
+        max_rss, user, system = report
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere.
+        rss = int(max_rss) // 1024 if sys.platform == "darwin" else int(max_rss)
+        return _Usage(float(user), float(system), rss)
+    if reaper.usage is not None:
+        # The probe died before reporting (timeout or cancel); CPU is still known, RSS is not.
+        return _Usage(reaper.usage.ru_utime, reaper.usage.ru_stime)
+    return _Usage()
+
+
+def _tail_text(chunks: deque[str]) -> str:
+    return "\n".join("".join(chunks).splitlines()[-TAIL_LINES:]).strip()
+
+
+def _kill_tree(proc: subprocess.Popen) -> None:
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_streaming(
+    command: str,
+    cwd: Path,
+    timeout_seconds: int,
+    logs: RunLogs | None = None,
+    log_path: Path | None = None,
+    cancel: threading.Event | None = None,
+) -> CapturedRun:
+    writer = logs.open(log_path) if logs is not None and log_path is not None else None
+    write_lock = threading.Lock()
+    stdout_tail: deque[str] = deque(maxlen=TAIL_LINES)
+    stderr_tail: deque[str] = deque(maxlen=TAIL_LINES)
+
+    read_fd = write_fd = None
+    args: str | list[str] = command
+    if os.name == "posix" and sys.executable:
+        read_fd, write_fd = os.pipe()
+        args = [sys.executable, "-I", "-S", "-c", RUSAGE_PROBE, str(write_fd), command]
+
+    proc = subprocess.Popen(
+        args,
+        shell=write_fd is None,
+        pass_fds=(write_fd,) if write_fd is not None else (),
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+        start_new_session=os.name == "posix",
+    )
+    if write_fd is not None:
+        os.close(write_fd)
+
+    closed = threading.Event()
+
+    def pump(stream: IO[str], tail: deque[str]) -> None:
+        # Bounded readline keeps memory flat even for output without newlines.
+        for chunk in iter(lambda: stream.readline(CHUNK_SIZE), ""):
+            tail.append(chunk)
+            if writer is not None:
+                with write_lock:
+                    if not closed.is_set():
+                        writer.write(chunk)
+        stream.close()
+
+    pumps = [
+        threading.Thread(target=pump, args=(proc.stdout, stdout_tail), daemon=True),
+        threading.Thread(target=pump, args=(proc.stderr, stderr_tail), daemon=True),
+    ]
+    for thread in pumps:
+        thread.start()
+
+    started = time.monotonic()
+    deadline = started + timeout_seconds
+    reaper = _Reaper(proc)
+    timed_out = False
+
+    def remaining() -> float:
+        return min(CANCEL_POLL_S, max(deadline - time.monotonic(), 0))
+
+    def expired() -> bool:
+        if cancel is not None and cancel.is_set():
+            raise RunCancelled(command)
+        return time.monotonic() >= deadline
+
+    try:
+        while not reaper.wait(remaining()):
+            if expired():
+                timed_out = True
+                _kill_tree(proc)
+                reaper.wait()
+                break
+        # A backgrounded grandchild can keep the pipes open after the shell exits; it shares the deadline.
+        for thread in pumps:
+            while not timed_out and thread.is_alive():
+                thread.join(remaining())
+                if thread.is_alive() and expired():
+                    timed_out = True
+                    _kill_tree(proc)
+    except BaseException:
+        # The child runs in its own session, so Ctrl-C does not reach it on its own.
+        _kill_tree(proc)
+        reaper.wait()
+        if read_fd is not None:
+            os.close(read_fd)
+        raise
+    finally:
+        # Anything that escaped the process group may still hold a pipe; stop waiting for it.
+        for thread in pumps:
+            thread.join(PUMP_DRAIN_S)
+        if writer is not None:
+            with write_lock:
+                closed.set()
+                writer.close()
+    duration = time.monotonic() - started
+    returncode = -1 if timed_out else proc.returncode
+    if read_fd is not None:
+        usage = _read_probe(read_fd, reaper)
+    elif reaper.usage is not None:
+        usage = _Usage(reaper.usage.ru_utime, reaper.usage.ru_stime)
+    else:
+        usage = _Usage()
+
+    stderr_text = _tail_text(stderr_tail)
+    if timed_out:
+        message = f"Command timed out after {timeout_seconds}s"
+        stderr_text = f"{stderr_text}\n{message}" if stderr_text else message
+
+    return CapturedRun(
+        returncode=returncode,
+        stdout_tail=_tail_text(stdout_tail),
+        stderr_tail=stderr_text,
+        timed_out=timed_out,
+        log_path=str(writer.path) if writer is not None else "",
+        duration_s=duration,
+        cpu_user_s=usage.cpu_user_s,
+        cpu_sys_s=usage.cpu_sys_s,
+        max_rss_kb=usage.max_rss_kb,
+    )
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Version 1 is the untyped layout written before schema versioning (no field is guaranteed).
+DAY_SCHEMA_VERSION = 2
+
+
+def now_iso() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def normalize_payload(payload: dict) -> dict:
+    payload.setdefault("tasks", [])
+    payload.setdefault("notes", [])
+    fallback_created = payload.get("created_at") or now_iso()
+
+    for task in payload["tasks"]:
+        task.setdefault("kind", "manual")
+        task.setdefault("command", "")
+
+        done_flag = bool(task.get("done", False))
+        if "status" not in task:
+            task["status"] = "done" if done_flag else "pending"
+
+        # Keep backward-compatibility with old structure.
+        task["done"] = task["status"] == "done"
+        task.setdefault("created_at", fallback_created)
+
+    payload["schema_version"] = DAY_SCHEMA_VERSION
+    return payload
+
+
+TASK_KEYS = {
+    "id",
+    "text",
+    "kind",
+    "command",
+    "status",
+    "done",
+    "created_at",
+    "started_at",
+    "done_at",
+    "last_run",
+    "inputs",
+    "env",
+    "priority",
+    "weight",
+    "retry",
+    "attempts",
+    "next_attempt_at",
+    "runner",
+    "interrupted",
+}
+
+
+@dataclass(slots=True)
+class Task:
+    id: int
+    text: str
+    kind: str = "command"
+    command: str = ""
+    status: str = "pending"
+    created_at: str = ""
+    started_at: str = ""
+    done_at: str = ""
+    last_run: dict | None = None
+    inputs: list[str] = field(default_factory=list)
+    env: list[str] = field(default_factory=list)
+    priority: int = 0
+    cpu: float = 1.0
+    mem_mb: int = 0
+    max_attempts: int = 0
+    backoff_s: float = 0.0
+    max_backoff_s: float = 0.0
+    attempts: int = 0
+    next_attempt_at: str = ""
+    runner: dict | None = None
+    interrupted: dict | None = None
+    # Keys this version does not know about, written back untouched.
+    extra: dict = field(default_factory=dict)
+
+    @property
+    def done(self) -> bool:
+        return self.status == "done"
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        weight = data.get("weight") or {}
+        retry = data.get("retry") or {}
+        return cls(
+            id=int(data["id"]),
+            text=data.get("text", ""),
+            kind=data.get("kind", "manual"),
+            command=data.get("command", ""),
+            status=data.get("status") or ("done" if data.get("done") else "pending"),
+            created_at=data.get("created_at", ""),
+            started_at=data.get("started_at", ""),
+            done_at=data.get("done_at", ""),
+            last_run=data.get("last_run"),
+            inputs=list(data.get("inputs") or []),
+            env=list(data.get("env") or []),
+            priority=int(data.get("priority", 0)),
+            cpu=float(weight.get("cpu", 1.0)),
+            mem_mb=int(weight.get("mem_mb", 0)),
+            max_attempts=int(retry.get("max_attempts", 0)),
+            backoff_s=float(retry.get("backoff_s", 0.0)),
+            max_backoff_s=float(retry.get("max_backoff_s", 0.0)),
+            attempts=int(data.get("attempts", 0)),
+            next_attempt_at=data.get("next_attempt_at", ""),
+            runner=data.get("runner"),
+            interrupted=data.get("interrupted"),
+            extra={key: value for key, value in data.items() if key not in TASK_KEYS},
+        )
+
+    def to_dict(self) -> dict:
+        data = {
+            "id": self.id,
+            "text": self.text,
+            "kind": self.kind,
+            "command": self.command,
+            "status": self.status,
+            "done": self.done,
+            "created_at": self.created_at,
+        }
+        if self.started_at:
+            data["started_at"] = self.started_at
+        if self.done_at:
+            data["done_at"] = self.done_at
+        if self.last_run is not None:
+            data["last_run"] = self.last_run
+        if self.inputs:
+            data["inputs"] = self.inputs
+        if self.env:
+            data["env"] = self.env
+        if self.priority:
+            data["priority"] = self.priority
+        if self.cpu != 1.0 or self.mem_mb:
+            data["weight"] = {"cpu": self.cpu, "mem_mb": self.mem_mb}
+        if self.max_attempts or self.backoff_s:
+            data["retry"] = {"max_attempts": self.max_attempts, "backoff_s": self.backoff_s}
+            if self.max_backoff_s:
+                data["retry"]["max_backoff_s"] = self.max_backoff_s
+        if self.attempts:
+            data["attempts"] = self.attempts
+        if self.next_attempt_at:
+            data["next_attempt_at"] = self.next_attempt_at
+        if self.runner is not None:
+            data["runner"] = self.runner
+        if self.interrupted is not None:
+            data["interrupted"] = self.interrupted
+        data.update(self.extra)
+        return data
+
+    def start(self, runner: dict) -> None:
+        self.status = "running"
+        self.started_at = now_iso()
+        self.runner = runner
+        self.attempts += 1
+
+    def mark_done(self) -> None:
+        self.status = "done"
+        self.done_at = now_iso()
+
+    def requeue(self, reason: str) -> None:
+        self.status = "pending"
+        self.runner = None
+        self.interrupted = {"reason": reason, "started_at": self.started_at, "at": now_iso()}
+
+
+@dataclass(slots=True)
+class Note:
+    text: str
+    created_at: str = ""
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Note":
+        return cls(text=data.get("text", ""), created_at=data.get("created_at", ""))
+
+    def to_dict(self) -> dict:
+        return {"text": self.text, "created_at": self.created_at}
+
+
+@dataclass(slots=True)
+class Day:
+    date: str
+    tasks: list[Task] = field(default_factory=list)
+    notes: list[Note] = field(default_factory=list)
+    created_at: str = ""
+    updated_at: str = ""
+    extra: dict = field(default_factory=dict)
+    # Task id -> position in `tasks`, checked on every lookup since callers may edit the list directly.
+    _by_id: dict[int, int] = field(default_factory=dict, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Day":
+        # Migration happens here, once per load; everything downstream trusts the typed fields.
+        if data.get("schema_version", 1) < DAY_SCHEMA_VERSION:
+            normalize_payload(data)
+        known = {"date", "tasks", "notes", "created_at", "updated_at", "schema_version"}
+        return cls(
+            date=data.get("date", ""),
+            tasks=[Task.from_dict(task) for task in data.get("tasks", [])],
+            notes=[Note.from_dict(note) for note in data.get("notes", [])],
+            created_at=data.get("created_at", ""),
+            updated_at=data.get("updated_at", ""),
+            extra={key: value for key, value in data.items() if key not in known},
+        )
+
+    def to_dict(self) -> dict:
+        data = {
+            "schema_version": DAY_SCHEMA_VERSION,
+            "date": self.date,
+            "tasks": [task.to_dict() for task in self.tasks],
+            "notes": [note.to_dict() for note in self.notes],
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+        data.update(self.extra)
+        return data
+
+    def get(self, task_id: int) -> Task | None:
+        position = self._by_id.get(task_id)
+        if position is None or position >= len(self.tasks) or self.tasks[position].id != task_id:
+            self._by_id = {task.id: index for index, task in enumerate(self.tasks)}
+            position = self._by_id.get(task_id)
+            if position is None:
+                return None
+        return self.tasks[position]
+
+    def next_id(self) -> int:
+        return max((task.id for task in self.tasks), default=0) + 1
+
+    def add(self, task: Task) -> Task:
+        self.tasks.append(task)
+        self._by_id[task.id] = len(self.tasks) - 1
+        return task
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from .model import Task
+
+DEFAULT_BACKOFF_S = 30.0
+MAX_BACKOFF_S = 3600.0
+
+
+def schedule_fields(
+    priority: int = 0,
+    cpu: float = 1.0,
+    mem_mb: int = 0,
+    max_attempts: int = 0,
+    backoff_s: float = 0.0,
+) -> dict:
+    fields: dict = {}
+    if priority:
+        fields["priority"] = priority
+    if cpu != 1.0 or mem_mb:
+        fields["weight"] = {"cpu": cpu, "mem_mb": mem_mb}
+    if max_attempts or backoff_s:
+        if max_attempts and not backoff_s:
+            backoff_s = DEFAULT_BACKOFF_S
+        fields["retry"] = {"max_attempts": max_attempts, "backoff_s": backoff_s}
+    return fields
+
+
+def retry_delay(task: Task) -> float:
+    base = task.backoff_s
+    if base <= 0:
+        return 0.0
+    attempts = max(task.attempts, 1)
+    return min(base * 2 ** (attempts - 1), task.max_backoff_s or MAX_BACKOFF_S)
+
+
+def retries_exhausted(task: Task) -> bool:
+    return task.max_attempts > 0 and task.attempts >= task.max_attempts
+
+
+def schedule_retry(task: Task, now: datetime) -> None:
+    delay = retry_delay(task)
+    if delay > 0 and not retries_exhausted(task):
+        task.next_attempt_at = (now + timedelta(seconds=delay)).isoformat(timespec="seconds")
+    else:
+        task.next_attempt_at = ""
+
+
+def eligible(task: Task, now: datetime) -> bool:
+    if task.status == "pending":
+        return True
+    if task.status != "failed" or retries_exhausted(task):
+        return False
+    return not task.next_attempt_at or datetime.fromisoformat(task.next_attempt_at) <= now
+
+
+def order_tasks(tasks: list[Task]) -> list[Task]:
+    # Higher priority first; the sort is stable, so equal priorities keep insertion order.
+    return sorted(tasks, key=lambda task: -task.priority)
+
+
+def _load_average() -> float | None:
+    try:
+        return os.getloadavg()[0]
+    except (AttributeError, OSError):
+        return None
+
+
+def _available_memory_mb() -> int | None:
+    try:
+        with Path("/proc/meminfo").open(encoding="utf-8") as handle:
+            for line in handle:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        return None
+    return None
+
+
+@dataclass
+class Capacity:
+    max_load: float = field(default_factory=lambda: float(os.cpu_count() or 1))
+    min_free_mb: int = 256
+    # A task refused for longer than this stops lighter tasks from overtaking it.
+    patience_s: float = 60.0
+
+    def load_average(self) -> float | None:
+        return _load_average()
+
+    def available_memory_mb(self) -> int | None:
+        return _available_memory_mb()
+
+    def admits(self, task: Task, running: list[Task]) -> bool:
+        # The load average lags behind, so count the CPU weight of tasks we already started.
+        load = self.load_average()
+        if load is not None:
+            projected = load + sum(item.cpu for item in running) + task.cpu
+            if running and projected > self.max_load:
+                return False
+            if not running and load > self.max_load:
+                return False
+        memory = self.available_memory_mb()
+        if memory is not None:
+            reserved = sum(item.mem_mb for item in running)
+            if memory - reserved - task.mem_mb < self.min_free_mb:
+                return False
+        return True
+
+
+class Scheduler:
+    def __init__(self, tasks: list[Task], capacity: Capacity | None, clock=time.monotonic) -> None:
+        self.queue = order_tasks(tasks)
+        self.capacity = capacity
+        self.clock = clock
+        self._refused_since: dict[int, float] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.queue)
+
+    def next_task(self, running: list[Task]) -> Task | None:
+        if not self.queue:
+            return None
+        if self.capacity is None:
+            return self.queue.pop(0)
+
+        now = self.clock()
+        for position, task in enumerate(self.queue):
+            if self.capacity.admits(task, running):
+                self._refused_since.pop(task.id, None)
+                return self.queue.pop(position)
+            waited = now - self._refused_since.setdefault(task.id, now)
+            if waited >= self.capacity.patience_s:
+                # Starving task: hold the queue for it, and run it alone once the box is idle.
+                if not running:
+                    self._refused_since.pop(task.id, None)
+                    return self.queue.pop(position)
+                return None
+        return None
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .jsonfiles import read_json, write_json
+
+if TYPE_CHECKING:
+    import asyncio
+
+# Working-tree edits do not touch HEAD or the index, so even a matching fingerprint expires quickly.
+SNAPSHOT_TTL_S = 60.0
+MAX_GIT_PROCS = 8
+COMMIT_LINES = 5
+
+
+def git_dir(repo: Path) -> Path | None:
+    dot_git = repo / ".git"
+    if dot_git.is_dir():
+        return dot_git
+    try:
+        text = dot_git.read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+    # Linked worktrees and submodules point at their real git dir from a `.git` file.
+    if not text.startswith("gitdir:"):
+        return None
+    path = Path(text[len("gitdir:"):].strip())
+    return path if path.is_absolute() else (repo / path).resolve()
+
+
+def find_repo(path: Path) -> Path | None:
+    path = path.resolve()
+    for candidate in (path, *path.parents):
+        if git_dir(candidate) is not None:
+            return candidate
+    return None
+
+
+def _stamp(path: Path) -> str:
+    try:
+        stat = path.stat()
+    except OSError:
+        return "-"
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def head_fingerprint(repo: Path) -> str:
+    # HEAD, the commit it resolves to and the index mtime, read from disk without spawning git.
+    directory = git_dir(repo)
+    if directory is None:
+        return ""
+    try:
+        head = (directory / "HEAD").read_text(encoding="utf-8").strip()
+    except OSError:
+        return ""
+    common = directory
+    try:
+        common = (directory / (directory / "commondir").read_text(encoding="utf-8").strip()).resolve()
+    except OSError:
+        pass
+    parts = [head]
+    if head.startswith("ref: "):
+        ref = common / head[len("ref: "):]
+        try:
+            parts.append(ref.read_text(encoding="utf-8").strip())
+        except OSError:
+            parts.append(_stamp(common / "packed-refs"))
+    parts.append(_stamp(directory / "index"))
+    return "|".join(parts)
+
+
+def parse_status(text: str) -> tuple[str, int]:
+    branch = ""
+    dirty = 0
+    for line in text.splitlines():
+        if line.startswith("# branch.head "):
+            branch = line[len("# branch.head "):].strip()
+        elif line.strip() and not line.startswith("#"):
+            dirty += 1
+    if branch == "(detached)":
+        branch = ""
+    return branch, dirty
+
+
+# asyncio is imported where it is used: it costs ~15 ms at import, and most commands never take a snapshot.
+async def _run_git(cwd: Path, args: list[str], limit: asyncio.Semaphore) -> str:
+    import asyncio
+
+    async with limit:
+        try:
+            # --no-optional-locks keeps `status` from refreshing the index, which would bump its mtime.
+            proc = await asyncio.create_subprocess_exec(
+                "git",
+                "--no-optional-locks",
+                *args,
+                cwd=cwd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+        except OSError:
+            return ""
+        stdout, _ = await proc.communicate()
+    if proc.returncode != 0:
+        return ""
+    return stdout.decode("utf-8", errors="replace").strip()
+
+
+async def _snapshot(repo: Path, limit: asyncio.Semaphore) -> dict:
+    import asyncio
+
+    # Branch and dirty files come from one `status --branch` call instead of two separate commands.
+    status, commits = await asyncio.gather(
+        _run_git(repo, ["status", "--porcelain=v2", "--branch"], limit),
+        _run_git(repo, ["log", "--since=midnight", "--oneline", "--max-count", str(COMMIT_LINES)], limit),
+    )
+    branch, dirty = parse_status(status)
+    return {
+        "branch": branch or "n/a",
+        "dirty_files": dirty,
+        "today_commits": [line for line in commits.splitlines() if line.strip()],
+    }
+
+
+async def _snapshot_all(repos: list[Path], max_procs: int) -> list[dict]:
+    import asyncio
+
+    limit = asyncio.Semaphore(max(max_procs, 1))
+    return await asyncio.gather(*(_snapshot(repo, limit) for repo in repos))
+
+
+class SnapshotCache:
+    def __init__(self, path: Path, ttl_s: float = SNAPSHOT_TTL_S, clock=time.time) -> None:
+        self.path = path
+        self.ttl_s = ttl_s
+        self.clock = clock
+        self._entries: dict[str, dict] | None = None
+        self._dirty = False
+
+    @property
+    def entries(self) -> dict[str, dict]:
+        if self._entries is None:
+            self._entries = read_json(self.path)
+        return self._entries
+
+    def lookup(self, repo: Path, fingerprint: str) -> dict | None:
+        entry = self.entries.get(str(repo))
+        if entry is None or not fingerprint or entry.get("fingerprint") != fingerprint:
+            return None
+        if self.clock() - entry.get("taken_at", 0.0) > self.ttl_s:
+            return None
+        return entry["snapshot"]
+
+    def store(self, repo: Path, fingerprint: str, snapshot: dict) -> None:
+        if not fingerprint:
+            return
+        self.entries[str(repo)] = {"fingerprint": fingerprint, "taken_at": self.clock(), "snapshot": snapshot}
+        self._dirty = True
+
+    def flush(self) -> None:
+        if not self._dirty or self._entries is None:
+            return
+        now = self.clock()
+        fresh = {key: entry for key, entry in self._entries.items() if now - entry.get("taken_at", 0.0) <= self.ttl_s}
+        write_json(self.path, fresh)
+        self._dirty = False
+
+
+def collect_snapshots(
+    repos: list[Path],
+    cache: SnapshotCache | None = None,
+    max_procs: int = MAX_GIT_PROCS,
+) -> dict[Path, dict]:
+    snapshots: dict[Path, dict] = {}
+    stale: list[tuple[Path, str]] = []
+    for repo in repos:
+        # Fingerprint before running git, so a change made mid-snapshot just invalidates the entry.
+        fingerprint = head_fingerprint(repo) if cache is not None else ""
+        hit = cache.lookup(repo, fingerprint) if cache is not None else None
+        if hit is not None:
+            snapshots[repo] = hit
+        else:
+            stale.append((repo, fingerprint))
+
+    if stale:
+        import asyncio
+
+        fresh = asyncio.run(_snapshot_all([repo for repo, _ in stale], max_procs))
+        for (repo, fingerprint), snapshot in zip(stale, fresh):
+            snapshots[repo] = snapshot
+            if cache is not None:
+                cache.store(repo, fingerprint, snapshot)
+    if cache is not None:
+        cache.flush()
+    return {repo: snapshots[repo] for repo in repos}
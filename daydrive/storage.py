@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Iterator, Protocol
+
+from .model import DAY_SCHEMA_VERSION
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+SCHEMA_VERSION = 1
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def empty_day(day: date) -> dict:
+    return {
+        "schema_version": DAY_SCHEMA_VERSION,
+        "date": day.isoformat(),
+        "tasks": [],
+        "notes": [],
+        "created_at": _now(),
+        "updated_at": _now(),
+    }
+
+
+def _dump(data: dict) -> str:
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+
+class StorageBackend(Protocol):
+    name: str
+
+    def load(self, day: date) -> dict | None: ...
+
+    def save(self, day: date, payload: dict) -> None: ...
+
+    def create_day(self, day: date, payload: dict) -> dict: ...
+
+    def insert_task(self, day: date, factory: Callable[[int], dict]) -> dict: ...
+
+    def insert_note(self, day: date, note: dict) -> None: ...
+
+    def put_task(self, day: date, task: dict) -> None: ...
+
+    def modify_task(self, day: date, task_id: int, change: Callable[[dict], None]) -> dict | None: ...
+
+    def days(self) -> list[date]: ...
+
+
+class JsonBackend:
+    name = "json"
+
+    def __init__(self, base_dir: Path) -> None:
+        self.days_dir = base_dir / "days"
+        self.archive_dir = base_dir / "archive"
+
+    def day_path(self, day: date) -> Path:
+        return self.days_dir / f"{day.isoformat()}.json"
+
+    @contextmanager
+    def _locked(self, day: date) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        self.days_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = self.days_dir / f".{day.isoformat()}.lock"
+        with lock_path.open("a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def load(self, day: date) -> dict | None:
+        path = self.day_path(day)
+        if not path.exists():
+            return self._load_archived(day)
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def _archive_path(self, day: date) -> Path:
+        return self.archive_dir / f"days-{day.year}.zip"
+
+    def _load_archived(self, day: date) -> dict | None:
+        archive = self._archive_path(day)
+        if not archive.exists():
+            return None
+        with zipfile.ZipFile(archive) as bundle:
+            try:
+                return json.loads(bundle.read(f"{day.isoformat()}.json").decode("utf-8"))
+            except KeyError:
+                return None
+
+    def compact(self, before: date) -> list[date]:
+        # Old days move into one zip per year; load() still falls back to the archive.
+        archived = []
+        for day in self._day_files():
+            if day >= before:
+                continue
+            path = self.day_path(day)
+            self.archive_dir.mkdir(parents=True, exist_ok=True)
+            with self._locked(day), zipfile.ZipFile(
+                self._archive_path(day), "a", compression=zipfile.ZIP_DEFLATED
+            ) as bundle:
+                # Zip entries cannot be replaced, so a day edited after archiving stays as a file.
+                if path.name in bundle.namelist():
+                    continue
+                bundle.write(path, arcname=path.name)
+                path.unlink()
+            archived.append(day)
+        return archived
+
+    def save(self, day: date, payload: dict) -> None:
+        path = self.day_path(day)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Temp file plus rename so readers never observe a half-written day.
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as handle:
+                handle.write(json.dumps(payload, indent=2) + "\n")
+            os.replace(tmp_name, path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+
+    def create_day(self, day: date, payload: dict) -> dict:
+        # Another process may have created the day since our load; never overwrite it.
+        with self._locked(day):
+            existing = self.load(day)
+            if existing is not None:
+                return existing
+            self.save(day, payload)
+            return payload
+
+    def _update(self, day: date, change: Callable[[dict], object]) -> object:
+        with self._locked(day):
+            payload = self.load(day) or empty_day(day)
+            result = change(payload)
+            payload["updated_at"] = _now()
+            self.save(day, payload)
+            return result
+
+    def insert_task(self, day: date, factory: Callable[[int], dict]) -> dict:
+        def change(payload: dict) -> dict:
+            tasks = payload.setdefault("tasks", [])
+            task = factory(max((item["id"] for item in tasks), default=0) + 1)
+            tasks.append(task)
+            return task
+
+        return self._update(day, change)
+
+    def insert_note(self, day: date, note: dict) -> None:
+        self._update(day, lambda payload: payload.setdefault("notes", []).append(note))
+
+    def put_task(self, day: date, task: dict) -> None:
+        def change(payload: dict) -> None:
+            tasks = payload.setdefault("tasks", [])
+            for index, item in enumerate(tasks):
+                if item["id"] == task["id"]:
+                    tasks[index] = task
+                    return
+            tasks.append(task)
+
+        self._update(day, change)
+
+    def modify_task(self, day: date, task_id: int, change: Callable[[dict], None]) -> dict | None:
+        def apply(payload: dict) -> dict | None:
+            for task in payload.setdefault("tasks", []):
+                if task["id"] == task_id:
+                    change(task)
+                    return task
+            return None
+
+        return self._update(day, apply)
+
+    def _day_files(self) -> list[date]:
+        if not self.days_dir.exists():
+            return []
+        found = []
+        for path in self.days_dir.glob("*.json"):
+            try:
+                found.append(date.fromisoformat(path.stem))
+            except ValueError:
+                continue
+        return sorted(found)
+
+    def _archived_days(self) -> set[date]:
+        found = set()
+        for archive in self.archive_dir.glob("days-*.zip"):
+            with zipfile.ZipFile(archive) as bundle:
+                for name in bundle.namelist():
+                    try:
+                        found.add(date.fromisoformat(Path(name).stem))
+                    except ValueError:
+                        continue
+        return found
+
+    def days(self) -> list[date]:
+        # A day edited after archiving exists in both places; load() prefers the file.
+        return sorted(set(self._day_files()) | self._archived_days())
+
+
+class SqliteBackend:
+    name = "sqlite"
+
+    def __init__(self, base_dir: Path) -> None:
+        self.path = base_dir / "daydrive.sqlite"
+        self.days_dir = base_dir / "days"
+        self._conn: sqlite3.Connection | None = None
+        # Parallel runs checkpoint from worker threads; one connection, one transaction at a time.
+        self._lock = threading.RLock()
+        # Row images from the last load, so save() only rewrites what changed.
+        self._loaded: dict[str, tuple[dict[int, str], int]] = {}
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn = conn
+            self._init_schema()
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            conn = self.conn
+            # IMMEDIATE takes the single writer lock up front; WAL readers are not blocked.
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _init_schema(self) -> None:
+        with self._write() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= SCHEMA_VERSION:
+                return
+            conn.execute("CREATE TABLE IF NOT EXISTS days (day TEXT PRIMARY KEY, data TEXT NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "day TEXT NOT NULL, id INTEGER NOT NULL, data TEXT NOT NULL, PRIMARY KEY (day, id))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS notes ("
+                "seq INTEGER PRIMARY KEY AUTOINCREMENT, day TEXT NOT NULL, data TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS notes_day ON notes (day, seq)")
+            self._migrate_json(conn)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_json(self, conn: sqlite3.Connection) -> None:
+        if not self.days_dir.exists():
+            return
+        for path in sorted(self.days_dir.glob("*.json")):
+            try:
+                day = date.fromisoformat(path.stem)
+                payload = json.loads(path.read_text(encoding="utf-8"))
+            except ValueError:
+                continue
+            self._write_all(conn, day.isoformat(), payload)
+
+    def _write_meta(self, conn: sqlite3.Connection, key: str, payload: dict) -> None:
+        meta = {name: value for name, value in payload.items() if name not in {"tasks", "notes"}}
+        conn.execute("INSERT OR REPLACE INTO days (day, data) VALUES (?, ?)", (key, _dump(meta)))
+
+    def _write_all(self, conn: sqlite3.Connection, key: str, payload: dict) -> None:
+        self._write_meta(conn, key, payload)
+        conn.execute("DELETE FROM tasks WHERE day = ?", (key,))
+        conn.execute("DELETE FROM notes WHERE day = ?", (key,))
+        conn.executemany(
+            "INSERT INTO tasks (day, id, data) VALUES (?, ?, ?)",
+            [(key, task["id"], _dump(task)) for task in payload.get("tasks", [])],
+        )
+        conn.executemany(
+            "INSERT INTO notes (day, data) VALUES (?, ?)",
+            [(key, _dump(note)) for note in payload.get("notes", [])],
+        )
+
+    def _ensure_day(self, conn: sqlite3.Connection, day: date) -> None:
+        meta = {name: value for name, value in empty_day(day).items() if name not in {"tasks", "notes"}}
+        conn.execute("INSERT OR IGNORE INTO days (day, data) VALUES (?, ?)", (day.isoformat(), _dump(meta)))
+
+    def _touch(self, conn: sqlite3.Connection, day: date) -> None:
+        conn.execute(
+            "UPDATE days SET data = json_set(data, '$.updated_at', ?) WHERE day = ?",
+            (_now(), day.isoformat()),
+        )
+
+    def load(self, day: date) -> dict | None:
+        key = day.isoformat()
+        with self._lock:
+            conn = self.conn
+            conn.execute("BEGIN")
+            try:
+                row = conn.execute("SELECT data FROM days WHERE day = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                task_rows = conn.execute("SELECT id, data FROM tasks WHERE day = ? ORDER BY id", (key,)).fetchall()
+                note_rows = conn.execute("SELECT data FROM notes WHERE day = ? ORDER BY seq", (key,)).fetchall()
+            finally:
+                conn.execute("COMMIT")
+
+        payload = json.loads(row[0])
+        payload["tasks"] = [json.loads(data) for _, data in task_rows]
+        payload["notes"] = [json.loads(data) for (data,) in note_rows]
+        self._loaded[key] = ({task_id: data for task_id, data in task_rows}, len(note_rows))
+        return payload
+
+    def save(self, day: date, payload: dict) -> None:
+        key = day.isoformat()
+        snapshot = self._loaded.get(key)
+        with self._write() as conn:
+            if snapshot is None:
+                self._write_all(conn, key, payload)
+            else:
+                task_images, note_count = snapshot
+                self._write_meta(conn, key, payload)
+                changed = []
+                for task in payload.get("tasks", []):
+                    image = _dump(task)
+                    if task_images.get(task["id"]) != image:
+                        changed.append((key, task["id"], image))
+                conn.executemany("INSERT OR REPLACE INTO tasks (day, id, data) VALUES (?, ?, ?)", changed)
+                conn.executemany(
+                    "INSERT INTO notes (day, data) VALUES (?, ?)",
+                    [(key, _dump(note)) for note in payload.get("notes", [])[note_count:]],
+                )
+        self._loaded[key] = (
+            {task["id"]: _dump(task) for task in payload.get("tasks", [])},
+            len(payload.get("notes", [])),
+        )
+
+    def create_day(self, day: date, payload: dict) -> dict:
+        key = day.isoformat()
+        with self._write() as conn:
+            meta = {name: value for name, value in payload.items() if name not in {"tasks", "notes"}}
+            created = conn.execute(
+                "INSERT OR IGNORE INTO days (day, data) VALUES (?, ?)", (key, _dump(meta))
+            ).rowcount
+            if created:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO tasks (day, id, data) VALUES (?, ?, ?)",
+                    [(key, task["id"], _dump(task)) for task in payload.get("tasks", [])],
+                )
+                conn.executemany(
+                    "INSERT INTO notes (day, data) VALUES (?, ?)",
+                    [(key, _dump(note)) for note in payload.get("notes", [])],
+                )
+        # Reload either way, so the row snapshot used by save() matches what is stored.
+        return self.load(day) or payload
+
+    def insert_task(self, day: date, factory: Callable[[int], dict]) -> dict:
+        with self._write() as conn:
+            self._ensure_day(conn, day)
+            last_id = conn.execute("SELECT MAX(id) FROM tasks WHERE day = ?", (day.isoformat(),)).fetchone()[0]
+            task = factory((last_id or 0) + 1)
+            conn.execute(
+                "INSERT INTO tasks (day, id, data) VALUES (?, ?, ?)",
+                (day.isoformat(), task["id"], _dump(task)),
+            )
+            self._touch(conn, day)
+        return task
+
+    def insert_note(self, day: date, note: dict) -> None:
+        with self._write() as conn:
+            self._ensure_day(conn, day)
+            conn.execute("INSERT INTO notes (day, data) VALUES (?, ?)", (day.isoformat(), _dump(note)))
+            self._touch(conn, day)
+
+    def put_task(self, day: date, task: dict) -> None:
+        with self._write() as conn:
+            self._ensure_day(conn, day)
+            conn.execute(
+                "INSERT OR REPLACE INTO tasks (day, id, data) VALUES (?, ?, ?)",
+                (day.isoformat(), task["id"], _dump(task)),
+            )
+            self._touch(conn, day)
+
+    def modify_task(self, day: date, task_id: int, change: Callable[[dict], None]) -> dict | None:
+        with self._write() as conn:
+            row = conn.execute(
+                "SELECT data FROM tasks WHERE day = ? AND id = ?", (day.isoformat(), task_id)
+            ).fetchone()
+            if row is None:
+                return None
+            task = json.loads(row[0])
+            change(task)
+            conn.execute(
+                "UPDATE tasks SET data = ? WHERE day = ? AND id = ?",
+                (_dump(task), day.isoformat(), task_id),
+            )
+            self._touch(conn, day)
+        return task
+
+    def days(self) -> list[date]:
+        return [date.fromisoformat(key) for (key,) in self.conn.execute("SELECT day FROM days ORDER BY day")]
+
+
+BACKENDS = {"json": JsonBackend, "sqlite": SqliteBackend}
+
+
+def open_backend(name: str, base_dir: Path) -> StorageBackend:
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown storage backend: {name} (expected one of {', '.join(BACKENDS)})") from None
+    return backend_cls(base_dir)
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import os
+import re
+import time
+from pathlib import Path
+from typing import Callable
+
+from .model import Day, Task
+
+WILDCARDS = set("*?[")
+
+
+def _translate_segment(segment: str) -> str:
+    out = []
+    index = 0
+    while index < len(segment):
+        char = segment[index]
+        if char == "*":
+            out.append("[^/]*")
+        elif char == "?":
+            out.append("[^/]")
+        elif char == "[":
+            end = segment.find("]", index + 1)
+            if end == -1:
+                out.append(re.escape(char))
+            else:
+                body = segment[index + 1 : end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                index = end
+        else:
+            out.append(re.escape(char))
+        index += 1
+    return "".join(out)
+
+
+def glob_to_regex(pattern: str) -> re.Pattern[str]:
+    segments = [segment for segment in pattern.replace("\\", "/").split("/") if segment and segment != "."]
+    parts = []
+    for index, segment in enumerate(segments):
+        last = index == len(segments) - 1
+        if segment == "**":
+            parts.append(".*" if last else "(?:[^/]+/)*")
+        else:
+            parts.append(_translate_segment(segment) + ("" if last else "/"))
+    return re.compile("".join(parts) + r"\Z")
+
+
+def _walk_roots(patterns: list[str]) -> dict[str, int | None]:
+    # Only the literal prefix of each glob is walked; depth is unbounded when the glob has "**".
+    roots: dict[str, int | None] = {}
+    for pattern in patterns:
+        segments = [segment for segment in pattern.replace("\\", "/").split("/") if segment and segment != "."]
+        literal = []
+        for segment in segments[:-1]:
+            if WILDCARDS & set(segment):
+                break
+            literal.append(segment)
+        rest = segments[len(literal) :]
+        depth = None if "**" in rest else max(len(rest) - 1, 0)
+        key = "/".join(literal)
+        if key in roots:
+            current = roots[key]
+            roots[key] = None if current is None or depth is None else max(current, depth)
+        else:
+            roots[key] = depth
+    return roots
+
+
+class TreeIndex:
+    def __init__(self, root: Path, patterns: list[str]) -> None:
+        self.root = root
+        self.patterns = list(patterns)
+        self.matchers = [glob_to_regex(pattern) for pattern in self.patterns]
+        self.files: dict[str, tuple[int, int]] = {}
+        self.dirs: dict[str, tuple[int, int | None]] = {}
+        for rel, depth in _walk_roots(self.patterns).items():
+            self._list_dir(rel, depth)
+
+    def matches(self, rel: str) -> bool:
+        return any(matcher.match(rel) for matcher in self.matchers)
+
+    def _abs(self, rel: str) -> str:
+        return os.path.join(self.root, rel) if rel else str(self.root)
+
+    def _list_dir(self, rel: str, depth: int | None) -> set[str]:
+        found: set[str] = set()
+        try:
+            stat = os.stat(self._abs(rel))
+            entries = list(os.scandir(self._abs(rel)))
+        except (FileNotFoundError, NotADirectoryError):
+            self.dirs.pop(rel, None)
+            return found
+        self.dirs[rel] = (stat.st_mtime_ns, depth)
+
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            child = f"{rel}/{entry.name}" if rel else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if (depth is None or depth > 0) and child not in self.dirs:
+                        found |= self._list_dir(child, None if depth is None else depth - 1)
+                elif child not in self.files and self.matches(child):
+                    child_stat = entry.stat()
+                    self.files[child] = (child_stat.st_mtime_ns, child_stat.st_size)
+                    found.add(child)
+            except FileNotFoundError:
+                continue
+        return found
+
+    def poll(self) -> set[str]:
+        changed: set[str] = set()
+        # Directory mtimes only move on create/delete/rename, so unchanged directories are never re-listed.
+        for rel, (mtime, depth) in list(self.dirs.items()):
+            try:
+                current = os.stat(self._abs(rel)).st_mtime_ns
+            except FileNotFoundError:
+                self.dirs.pop(rel, None)
+                continue
+            if current != mtime:
+                changed |= self._list_dir(rel, depth)
+
+        for rel, signature in list(self.files.items()):
+            try:
+                stat = os.stat(self._abs(rel))
+            except FileNotFoundError:
+                del self.files[rel]
+                changed.add(rel)
+                continue
+            current_sig = (stat.st_mtime_ns, stat.st_size)
+            if current_sig != signature:
+                self.files[rel] = current_sig
+                changed.add(rel)
+        return changed
+
+
+def affected_tasks(payload: Day, changed: set[str]) -> list[Task]:
+    affected = []
+    for task in payload.tasks:
+        if task.kind != "command" or not task.inputs:
+            continue
+        matchers = [glob_to_regex(pattern) for pattern in task.inputs]
+        if any(matcher.match(rel) for rel in changed for matcher in matchers):
+            affected.append(task)
+    return affected
+
+
+def watch_changes(
+    root: Path,
+    patterns_source: Callable[[], list[str]],
+    on_batch: Callable[[set[str]], None],
+    interval: float = 0.5,
+    debounce: float = 1.0,
+    refresh_seconds: float = 10.0,
+    should_stop: Callable[[], bool] = lambda: False,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> None:
+    index = TreeIndex(root, sorted(set(patterns_source())))
+    refreshed_at = clock()
+    pending: set[str] = set()
+    last_change = 0.0
+
+    while not should_stop():
+        now = clock()
+        changed = index.poll()
+        if changed:
+            pending |= changed
+            last_change = now
+        elif pending and now - last_change >= debounce:
+            batch, pending = pending, set()
+            on_batch(batch)
+        elif not pending and now - refreshed_at >= refresh_seconds:
+            # Pick up input globs of tasks added from another terminal.
+            patterns = sorted(set(patterns_source()))
+            if patterns != index.patterns:
+                index = TreeIndex(root, patterns)
+            refreshed_at = now
+        sleep(interval)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import hashlib
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import IO, Iterator
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX platforms
+    fcntl = None
+
+ACQUIRE_POLL_S = 0.2
+
+
+def _git(cwd: Path, args: list[str], stdin: bytes | None = None) -> str:
+    proc = subprocess.run(["git", *args], cwd=cwd, input=stdin, capture_output=True, check=False)
+    if proc.returncode != 0:
+        message = proc.stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(message or f"git command failed: {' '.join(args)}")
+    return proc.stdout.decode("utf-8", errors="replace").strip()
+
+
+def repo_root(cwd: Path) -> Path | None:
+    try:
+        return Path(_git(cwd, ["rev-parse", "--show-toplevel"]))
+    except (RuntimeError, OSError):
+        return None
+
+
+class WorktreePool:
+    def __init__(self, repo: Path, pool_dir: Path, max_size: int = 2) -> None:
+        self.repo = repo
+        self.max_size = max(max_size, 1)
+        digest = hashlib.sha1(str(repo.resolve()).encode("utf-8")).hexdigest()[:10]
+        self.root = pool_dir / f"{repo.name}-{digest}"
+        self._lock = threading.Lock()
+        self._admin_lock = threading.Lock()
+        self._held: dict[Path, IO[str] | None] = {}
+        self._head = ""
+        self._patch = b""
+
+    def slot_path(self, index: int) -> Path:
+        return self.root / f"slot-{index}"
+
+    def prepare(self) -> None:
+        # Snapshot HEAD plus uncommitted tracked changes once, so every task in a run sees the same tree.
+        self._head = _git(self.repo, ["rev-parse", "HEAD"])
+        proc = subprocess.run(
+            ["git", "diff", "--binary", "HEAD"], cwd=self.repo, capture_output=True, check=False
+        )
+        self._patch = proc.stdout if proc.returncode == 0 else b""
+
+    def _try_lock(self, slot: Path) -> IO[str] | None | bool:
+        if slot in self._held:
+            return False
+        if fcntl is None:
+            return None
+        self.root.mkdir(parents=True, exist_ok=True)
+        handle = (self.root / f".{slot.name}.lock").open("a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        return handle
+
+    @contextmanager
+    def _admin(self) -> Iterator[None]:
+        # `worktree prune` drops admin dirs it does not recognise yet, including one a concurrent
+        # `worktree add` has just created, so adding and pruning take turns across threads and processes.
+        with self._admin_lock:
+            if fcntl is None:
+                yield
+                return
+            self.root.mkdir(parents=True, exist_ok=True)
+            with (self.root / ".admin.lock").open("a") as handle:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _sync(self, slot: Path) -> None:
+        if (slot / ".git").exists():
+            # Reuse keeps ignored build outputs around, so incremental builds stay warm.
+            _git(slot, ["checkout", "--detach", "--force", "-q", self._head])
+            _git(slot, ["clean", "-fdq"])
+        else:
+            if slot.exists():
+                shutil.rmtree(slot)
+            with self._admin():
+                _git(self.repo, ["worktree", "prune"])
+                _git(self.repo, ["worktree", "add", "--detach", "-q", str(slot), self._head])
+        if self._patch:
+            _git(slot, ["apply", "--binary", "--whitespace=nowarn"], stdin=self._patch)
+
+    def acquire(self) -> Path:
+        if not self._head:
+            self.prepare()
+        while True:
+            with self._lock:
+                for index in range(self.max_size):
+                    slot = self.slot_path(index)
+                    handle = self._try_lock(slot)
+                    if handle is False:
+                        continue
+                    self._held[slot] = handle
+                    break
+                else:
+                    slot = None
+            if slot is not None:
+                try:
+                    self._sync(slot)
+                except BaseException:
+                    self.release(slot)
+                    raise
+                return slot
+            time.sleep(ACQUIRE_POLL_S)
+
+    def release(self, slot: Path) -> None:
+        with self._lock:
+            handle = self._held.pop(slot, None)
+        if handle is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+    def workdir(self, slot: Path, cwd: Path) -> Path:
+        try:
+            return slot / cwd.resolve().relative_to(self.repo.resolve())
+        except ValueError:
+            return slot
+
+    def prune(self) -> list[Path]:
+        removed = []
+        if not self.root.exists():
+            return removed
+        for slot in sorted(self.root.glob("slot-*")):
+            try:
+                index = int(slot.name.split("-", 1)[1])
+            except ValueError:
+                continue
+            if index < self.max_size:
+                continue
+            handle = self._try_lock(slot)
+            if handle is False:
+                continue
+            try:
+                try:
+                    with self._admin():
+                        _git(self.repo, ["worktree", "remove", "--force", str(slot)])
+                except RuntimeError:
+                    shutil.rmtree(slot, ignore_errors=True)
+                removed.append(slot)
+            finally:
+                if handle is not None:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    handle.close()
+        with self._admin():
+            _git(self.repo, ["worktree", "prune"])
+        return removed
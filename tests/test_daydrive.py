@@ -1,7 +1,12 @@
+import gzip
 import json
+import os
+import subprocess
 import tempfile
+import time
 import unittest
-from datetime import date
+import unittest.mock
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
 from daydrive.core import (
@@ -13,7 +18,21 @@ from daydrive.core import (
     list_tasks,
     mark_done,
     normalize_payload,
+    recover_orphaned_tasks,
+    review_repos,
+    runner_identity,
 )
+from daydrive.bench import QUICK_PARAMS, compare, run_benchmarks, synthetic_day
+from daydrive.cache import ResultCache, expand_inputs
+from daydrive.cli import run_capacity
+from daydrive.history import HistoryIndex, percentile, render_history
+from daydrive.logs import RotatingLogWriter, RunLogs, run_streaming
+from daydrive.model import DAY_SCHEMA_VERSION, Day, Task
+from daydrive.scheduler import Capacity, Scheduler, eligible, schedule_fields, schedule_retry
+from daydrive.snapshots import SnapshotCache, collect_snapshots, parse_status
+from daydrive.storage import JsonBackend
+from daydrive.worktrees import WorktreePool
+from daydrive.watch import TreeIndex, affected_tasks, glob_to_regex, watch_changes
 
 
 class DayDriveCoreTests(unittest.TestCase):
@@ -35,21 +54,23 @@ class DayDriveCoreTests(unittest.TestCase):
             self.assertEqual(len(saved["notes"]), 1)
 
     def test_mark_done_not_found(self) -> None:
-        payload = {"tasks": []}
+        payload = Day.from_dict({"tasks": []})
         _, found = mark_done(payload, 99)
         self.assertFalse(found)
 
     def test_list_tasks_empty_message(self) -> None:
-        payload = {"tasks": []}
+        payload = Day.from_dict({"tasks": []})
         msg = list_tasks(payload)
         self.assertIn("No tasks yet", msg)
 
     def test_build_review_contains_sections(self) -> None:
-        payload = {
-            "date": date.today().isoformat(),
-            "tasks": [{"id": 1, "text": "Prepare brief", "status": "pending", "done": False}],
-            "notes": [{"text": "Need simpler setup"}],
-        }
+        payload = Day.from_dict(
+            {
+                "date": date.today().isoformat(),
+                "tasks": [{"id": 1, "text": "Prepare brief", "status": "pending", "done": False}],
+                "notes": [{"text": "Need simpler setup"}],
+            }
+        )
         with tempfile.TemporaryDirectory() as tmp:
             report = build_review(payload, Path(tmp))
         self.assertIn("# DayDrive Review", report)
@@ -57,7 +78,7 @@ class DayDriveCoreTests(unittest.TestCase):
         self.assertIn("Prepare brief", report)
 
     def test_execute_pending_commands_success(self) -> None:
-        payload = {"tasks": [], "notes": [], "date": date.today().isoformat()}
+        payload = Day(date=date.today().isoformat())
         payload = add_task(payload, "Print ok", command="echo ok")
 
         with tempfile.TemporaryDirectory() as tmp:
@@ -65,11 +86,11 @@ class DayDriveCoreTests(unittest.TestCase):
 
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["status"], "done")
-        self.assertEqual(payload["tasks"][0]["status"], "done")
-        self.assertEqual(payload["tasks"][0]["last_run"]["returncode"], 0)
+        self.assertEqual(payload.tasks[0].status, "done")
+        self.assertEqual(payload.tasks[0].last_run["returncode"], 0)
 
     def test_execute_pending_commands_failure(self) -> None:
-        payload = {"tasks": [], "notes": [], "date": date.today().isoformat()}
+        payload = Day(date=date.today().isoformat())
         payload = add_task(payload, "Fail command", command="exit 2")
 
         with tempfile.TemporaryDirectory() as tmp:
@@ -77,8 +98,8 @@ class DayDriveCoreTests(unittest.TestCase):
 
         self.assertEqual(len(results), 1)
         self.assertEqual(results[0]["status"], "failed")
-        self.assertEqual(payload["tasks"][0]["status"], "failed")
-        self.assertEqual(payload["tasks"][0]["last_run"]["returncode"], 2)
+        self.assertEqual(payload.tasks[0].status, "failed")
+        self.assertEqual(payload.tasks[0].last_run["returncode"], 2)
 
     def test_normalize_payload_backfills_old_tasks(self) -> None:
         payload = {
@@ -91,10 +112,856 @@ class DayDriveCoreTests(unittest.TestCase):
         self.assertEqual(payload["tasks"][0]["kind"], "manual")
 
     def test_add_task_defaults_to_command_task(self) -> None:
-        payload = {"tasks": [], "notes": [], "date": date.today().isoformat()}
+        payload = Day(date=date.today().isoformat())
         payload = add_task(payload, "echo hello")
-        self.assertEqual(payload["tasks"][0]["kind"], "command")
-        self.assertEqual(payload["tasks"][0]["command"], "echo hello")
+        self.assertEqual(payload.tasks[0].kind, "command")
+        self.assertEqual(payload.tasks[0].command, "echo hello")
+
+
+class DayDriveModelTests(unittest.TestCase):
+    def test_legacy_day_is_migrated_once_on_load(self) -> None:
+        legacy = {
+            "date": "2026-01-05",
+            "created_at": "2026-01-05T08:00:00",
+            "tasks": [{"id": 1, "text": "Legacy", "done": True}],
+        }
+        day = Day.from_dict(legacy)
+        self.assertEqual((day.tasks[0].status, day.tasks[0].kind), ("done", "manual"))
+        self.assertEqual(day.tasks[0].created_at, "2026-01-05T08:00:00")
+
+        saved = day.to_dict()
+        self.assertEqual(saved["schema_version"], DAY_SCHEMA_VERSION)
+        with unittest.mock.patch("daydrive.model.normalize_payload") as normalize:
+            self.assertEqual(Day.from_dict(saved), day)
+        normalize.assert_not_called()
+
+    def test_round_trip_keeps_stored_layout_and_unknown_keys(self) -> None:
+        stored = {
+            "id": 3,
+            "text": "Build",
+            "kind": "command",
+            "command": "make",
+            "status": "failed",
+            "done": False,
+            "created_at": "2026-01-05T08:00:00",
+            "priority": 2,
+            "weight": {"cpu": 2.0, "mem_mb": 512},
+            "retry": {"max_attempts": 3, "backoff_s": 30.0},
+            "attempts": 1,
+            "owner": "ci",
+        }
+        self.assertEqual(Task.from_dict(dict(stored)).to_dict(), stored)
+
+    def test_get_uses_id_index(self) -> None:
+        day = Day(date="2026-01-05")
+        for _ in range(3):
+            add_task(day, "Work")
+        day.tasks.append(Task(id=7, text="Appended directly"))
+        self.assertEqual(day.get(2).id, 2)
+        self.assertEqual(day.get(7).text, "Appended directly")
+        self.assertIsNone(day.get(99))
+        self.assertEqual(mark_done(day, 3)[1], True)
+        self.assertTrue(day.tasks[2].done)
+
+        day.tasks[1] = Task(id=2, text="Replaced")
+        self.assertEqual(day.get(2).text, "Replaced")
+        del day.tasks[0]
+        self.assertEqual(day.get(3).text, "Work")
+        self.assertIsNone(day.get(1))
+
+
+class DayDriveLogTests(unittest.TestCase):
+    def test_execute_writes_full_log_and_bounded_tail(self) -> None:
+        payload = Day(date=date.today().isoformat())
+        payload = add_task(payload, "Chatty", command="seq 1 500; exit 3")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = RunLogs(Path(tmp) / "logs", compress=True)
+            payload, results = execute_pending_commands(payload, Path(tmp), run_all=True, logs=logs)
+
+            last_run = payload.tasks[0].last_run
+            self.assertEqual(results[0]["status"], "failed")
+            self.assertEqual(last_run["stdout_tail"].splitlines(), [str(n) for n in range(481, 501)])
+            with gzip.open(last_run["log_path"], "rt", encoding="utf-8") as handle:
+                self.assertEqual(len(handle.read().splitlines()), 500)
+
+    def test_execute_timeout_keeps_message(self) -> None:
+        payload = Day(date=date.today().isoformat())
+        payload = add_task(payload, "Slow", command="sleep 5")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            payload, results = execute_pending_commands(payload, Path(tmp), run_all=True, timeout_seconds=1)
+
+        self.assertEqual(results[0]["returncode"], -1)
+        self.assertIn("timed out after 1s", payload.tasks[0].last_run["stderr_tail"])
+
+    def test_timeout_covers_background_children_holding_the_pipes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            started = time.monotonic()
+            result = run_streaming("sleep 30 & echo hi", Path(tmp), timeout_seconds=1)
+
+        self.assertLess(time.monotonic() - started, 10)
+        self.assertTrue(result.timed_out)
+        self.assertEqual(result.returncode, -1)
+        self.assertEqual(result.stdout_tail, "hi")
+
+    def test_rotating_writer_keeps_bounded_segments(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "run.log"
+            writer = RotatingLogWriter(path, max_bytes=10, backup_count=2, compress=False)
+            for index in range(6):
+                writer.write(f"line-{index}\n")
+            writer.close()
+
+            self.assertEqual(path.read_text(encoding="utf-8"), "line-5\n")
+            self.assertEqual(Path(f"{path}.2").read_text(encoding="utf-8"), "line-3\n")
+            self.assertFalse(Path(f"{path}.3").exists())
+
+    def test_log_paths_stay_unique_within_a_second(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = RunLogs(Path(tmp))
+            with unittest.mock.patch("daydrive.logs.datetime") as clock:
+                clock.now.return_value = datetime(2026, 1, 2, 9, 30, 0)
+                first = logs.path_for("2026-01-02", 4)
+                second = logs.path_for("2026-01-02", 4)
+
+        self.assertEqual(first.name, "task-4-093000.log")
+        self.assertEqual(second.name, "task-4-093000-2.log")
+
+    def test_prune_removes_expired_day_folders(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = RunLogs(Path(tmp), retention_days=7)
+            (Path(tmp) / "2020-01-01").mkdir()
+            (Path(tmp) / date.today().isoformat()).mkdir()
+
+            removed = logs.prune(date.today())
+
+            self.assertEqual([folder.name for folder in removed], ["2020-01-01"])
+            self.assertTrue((Path(tmp) / date.today().isoformat()).exists())
+
+
+class DayDriveStorageTests(unittest.TestCase):
+    def test_creating_a_day_keeps_tasks_added_since_load(self) -> None:
+        for storage in ("json", "sqlite"):
+            with self.subTest(storage=storage), tempfile.TemporaryDirectory() as tmp:
+                today = date.today()
+                runner = DailyStore(Path(tmp), storage=storage)
+                other = DailyStore(Path(tmp), storage=storage)
+                real_load = runner.backend.load
+                calls = []
+
+                def racing_load(day: date) -> dict | None:
+                    # The day is missing when we look, then another process adds a task before we create it.
+                    calls.append(day)
+                    if len(calls) == 1:
+                        other.add_task(day, "Added meanwhile")
+                        return None
+                    return real_load(day)
+
+                with unittest.mock.patch.object(runner.backend, "load", side_effect=racing_load):
+                    payload = runner.load_or_create(today)
+
+                self.assertEqual([task.text for task in payload.tasks], ["Added meanwhile"])
+                self.assertEqual([task.text for task in other.load_or_create(today).tasks], ["Added meanwhile"])
+
+    def test_sqlite_store_round_trip(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp), storage="sqlite")
+            today = date.today()
+            store.add_task(today, "Build", command="make")
+            store.add_note(today, "Remember the changelog")
+            self.assertTrue(store.mark_done(today, 1))
+            self.assertFalse(store.mark_done(today, 9))
+
+            payload = DailyStore(Path(tmp), storage="sqlite").load_or_create(today)
+            self.assertEqual(payload.tasks[0].status, "done")
+            self.assertEqual(payload.tasks[0].command, "make")
+            self.assertEqual(payload.notes[0].text, "Remember the changelog")
+
+    def test_sqlite_save_keeps_concurrent_additions(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            today = date.today()
+            runner = DailyStore(Path(tmp), storage="sqlite")
+            runner.add_task(today, "First")
+            payload = runner.load_or_create(today)
+
+            other = DailyStore(Path(tmp), storage="sqlite")
+            other.add_task(today, "Added meanwhile")
+            other.add_note(today, "Noted meanwhile")
+
+            payload.tasks[0].status = "failed"
+            runner.save(today, payload)
+
+            merged = other.load_or_create(today)
+            self.assertEqual([task.status for task in merged.tasks], ["failed", "pending"])
+            self.assertEqual(len(merged.notes), 1)
+
+    def test_sqlite_migrates_existing_json_days(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            day = date(2026, 1, 5)
+            legacy = DailyStore(Path(tmp))
+            payload = legacy.load_or_create(day)
+            add_task(payload, "Legacy task")
+            add_note(payload, "Legacy note")
+            legacy.save(day, payload)
+
+            store = DailyStore(Path(tmp), storage="sqlite")
+            migrated = store.load_or_create(day)
+
+            self.assertEqual(migrated.tasks[0].text, "Legacy task")
+            self.assertEqual(migrated.notes[0].text, "Legacy note")
+            self.assertEqual(store.backend.days(), [day])
+
+    def test_json_store_row_operations(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp))
+            today = date.today()
+            self.assertIsInstance(store.backend, JsonBackend)
+            store.add_task(today, "One")
+            store.add_task(today, "Two")
+            store.mark_done(today, 2)
+
+            saved = json.loads(store.day_path(today).read_text(encoding="utf-8"))
+            self.assertEqual([task["id"] for task in saved["tasks"]], [1, 2])
+            self.assertEqual(saved["tasks"][1]["status"], "done")
+
+
+class DayDriveCheckpointTests(unittest.TestCase):
+    def test_execute_checkpoints_each_transition(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp))
+            today = date.today()
+            store.add_task(today, "Print ok", command="echo ok")
+            payload = store.load_or_create(today)
+            seen = []
+
+            def on_update(task: Task) -> None:
+                store.update_task(today, task)
+                seen.append(store.load_or_create(today).tasks[0].status)
+
+            execute_pending_commands(payload, Path(tmp), run_all=True, on_update=on_update)
+
+        self.assertEqual(seen, ["running", "done"])
+
+    def test_runner_skips_tasks_moved_on_since_load(self) -> None:
+        for storage in ("json", "sqlite"):
+            with self.subTest(storage=storage), tempfile.TemporaryDirectory() as tmp:
+                store = DailyStore(Path(tmp), storage=storage)
+                today = date.today()
+                store.add_task(today, "Finished by hand", command="touch ran-1")
+                store.add_task(today, "Claimed elsewhere", command="touch ran-2")
+                store.add_task(today, "Still pending", command="touch ran-3")
+                payload = store.load_or_create(today)
+                store.mark_done(today, 1)
+                self.assertIsNotNone(store.claim_task(today, 2))
+
+                _, results = execute_pending_commands(
+                    payload,
+                    Path(tmp),
+                    run_all=True,
+                    on_update=lambda task: store.update_task(today, task),
+                    claim=lambda task: store.claim_task(today, task.id),
+                )
+
+                self.assertEqual([result["id"] for result in results], [3])
+                self.assertFalse((Path(tmp) / "ran-1").exists())
+                self.assertFalse((Path(tmp) / "ran-2").exists())
+                stored = store.load_or_create(today)
+                self.assertEqual([task.status for task in stored.tasks], ["done", "running", "done"])
+                self.assertEqual(stored.tasks[2].attempts, 0)
+
+    def test_recover_requeues_tasks_of_dead_runner(self) -> None:
+        payload = Day.from_dict(
+            {
+                "tasks": [
+                    {"id": 1, "text": "Orphan", "status": "running", "runner": {"pid": 2**22 + 1, "host": "x"}},
+                    {"id": 2, "text": "Live", "status": "running", "runner": runner_identity()},
+                    {"id": 3, "text": "Finished", "status": "done"},
+                ]
+            }
+        )
+        recovered = recover_orphaned_tasks(payload)
+
+        self.assertEqual([task.id for task in recovered], [1])
+        self.assertEqual([task.status for task in payload.tasks], ["pending", "running", "done"])
+        self.assertIsNone(payload.tasks[0].runner)
+        self.assertIsNotNone(payload.tasks[0].interrupted)
+
+    def test_recover_detects_reused_pid(self) -> None:
+        runner = dict(runner_identity(), started="1")
+        payload = Day.from_dict({"tasks": [{"id": 1, "text": "Stale", "status": "running", "runner": runner}]})
+        recovered = recover_orphaned_tasks(payload)
+        expected = 1 if runner_identity()["started"] else 0
+        self.assertEqual(len(recovered), expected)
+
+
+class DayDriveCacheTests(unittest.TestCase):
+    def _run_twice(self, root: Path, change_between=None) -> list[dict]:
+        cache = ResultCache(root / "cache")
+        results = []
+        for attempt in range(2):
+            payload = Day(date=date.today().isoformat())
+            add_task(payload, "Count", command="cat src/*.txt >> ran.txt", inputs=["src/*.txt"])
+            _, batch = execute_pending_commands(payload, root, run_all=True, cache=cache)
+            cache.flush()
+            results.extend(batch)
+            if change_between and attempt == 0:
+                change_between()
+        return results
+
+    def test_unchanged_inputs_are_served_from_cache(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "src").mkdir()
+            (root / "src" / "a.txt").write_text("one\n", encoding="utf-8")
+
+            results = self._run_twice(root)
+
+            self.assertEqual([result.get("cached", False) for result in results], [False, True])
+            self.assertEqual((root / "ran.txt").read_text(encoding="utf-8"), "one\n")
+
+    def test_changed_inputs_rerun(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "src").mkdir()
+            (root / "src" / "a.txt").write_text("one\n", encoding="utf-8")
+
+            results = self._run_twice(root, lambda: (root / "src" / "a.txt").write_text("two\n", encoding="utf-8"))
+
+            self.assertEqual([result.get("cached", False) for result in results], [False, False])
+
+    def test_env_names_are_part_of_the_key(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(Path(tmp) / "cache")
+            (Path(tmp) / "main.c").write_text("int main;\n", encoding="utf-8")
+            task = Task.from_dict({"id": 1, "command": "make", "inputs": ["*.c"], "env": ["DAYDRIVE_TEST_FLAG"]})
+            with unittest.mock.patch.dict("os.environ", {"DAYDRIVE_TEST_FLAG": "1"}):
+                first = cache.key_for(task, Path(tmp))
+            with unittest.mock.patch.dict("os.environ", {"DAYDRIVE_TEST_FLAG": "2"}):
+                second = cache.key_for(task, Path(tmp))
+            self.assertNotEqual(first, second)
+            self.assertEqual(cache.key_for(Task.from_dict({"id": 1, "command": "make"}), Path(tmp)), "")
+
+    def test_key_covers_the_root_and_skips_unusable_inputs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(Path(tmp) / "cache")
+            task = Task.from_dict({"id": 1, "command": "make", "inputs": ["*.c"]})
+            first, second = Path(tmp) / "one", Path(tmp) / "two"
+            for root in (first, second):
+                root.mkdir()
+            self.assertEqual(cache.key_for(task, first), "")
+
+            for root in (first, second):
+                (root / "main.c").write_text("int main;\n", encoding="utf-8")
+            self.assertNotEqual(cache.key_for(task, first), cache.key_for(task, second))
+
+            with unittest.mock.patch.object(cache.hasher, "file_digest", side_effect=PermissionError):
+                self.assertEqual(cache.key_for(task, first), "")
+
+    def test_eviction_drops_least_recently_used(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = ResultCache(Path(tmp), max_entries=2)
+            for key in ["a", "b", "c"]:
+                cache.store(key, "make", {"returncode": 0})
+            cache.entries["a"]["used_at"] = "2000-01-01T00:00:00"
+            cache.flush()
+
+            reloaded = ResultCache(Path(tmp), max_entries=2)
+            self.assertEqual(sorted(reloaded.entries), ["b", "c"])
+
+    def test_expand_inputs_supports_recursive_globs(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "pkg" / "sub").mkdir(parents=True)
+            (root / "pkg" / "a.py").write_text("", encoding="utf-8")
+            (root / "pkg" / "sub" / "b.py").write_text("", encoding="utf-8")
+            (root / "pkg" / "c.txt").write_text("", encoding="utf-8")
+
+            found = [path.relative_to(root).as_posix() for path in expand_inputs(root, ["pkg/**/*.py"])]
+            self.assertEqual(found, ["pkg/a.py", "pkg/sub/b.py"])
+
+
+class DayDriveWatchTests(unittest.TestCase):
+    def test_glob_to_regex(self) -> None:
+        pattern = glob_to_regex("src/**/*.py")
+        self.assertTrue(pattern.match("src/a.py"))
+        self.assertTrue(pattern.match("src/pkg/deep/b.py"))
+        self.assertFalse(pattern.match("src/a.pyc"))
+        self.assertFalse(pattern.match("tests/a.py"))
+        self.assertTrue(glob_to_regex("*.cfg").match("setup.cfg"))
+        self.assertFalse(glob_to_regex("*.cfg").match("conf/setup.cfg"))
+
+    def test_tree_index_reports_modified_added_and_removed_files(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "src" / "pkg").mkdir(parents=True)
+            (root / "src" / "a.py").write_text("a", encoding="utf-8")
+            (root / "src" / "notes.md").write_text("n", encoding="utf-8")
+            index = TreeIndex(root, ["src/**/*.py"])
+            self.assertEqual(set(index.files), {"src/a.py"})
+            self.assertEqual(index.poll(), set())
+
+            (root / "src" / "a.py").write_text("changed", encoding="utf-8")
+            (root / "src" / "pkg" / "b.py").write_text("b", encoding="utf-8")
+            (root / "src" / "notes.md").write_text("ignored", encoding="utf-8")
+            self.assertEqual(index.poll(), {"src/a.py", "src/pkg/b.py"})
+
+            (root / "src" / "a.py").unlink()
+            self.assertEqual(index.poll(), {"src/a.py"})
+
+    def test_tree_index_only_walks_glob_prefix(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "src").mkdir()
+            (root / "node_modules" / "dep").mkdir(parents=True)
+            index = TreeIndex(root, ["src/**/*.js"])
+            self.assertEqual(set(index.dirs), {"src"})
+
+    def test_watch_debounces_bursts_into_one_batch(self) -> None:
+        class FakeIndex:
+            def __init__(self) -> None:
+                self.ticks = [{"a.py"}, {"b.py"}, set(), set(), set(), set()]
+
+            def poll(self) -> set[str]:
+                return self.ticks.pop(0) if self.ticks else set()
+
+        fake = FakeIndex()
+        clock = iter(range(100))
+        batches = []
+        with unittest.mock.patch("daydrive.watch.TreeIndex", return_value=fake):
+            watch_changes(
+                Path("."),
+                lambda: ["*.py"],
+                batches.append,
+                debounce=2,
+                should_stop=lambda: not fake.ticks,
+                clock=lambda: next(clock),
+                sleep=lambda _: None,
+            )
+        self.assertEqual(batches, [{"a.py", "b.py"}])
+
+    def test_affected_tasks_match_declared_inputs(self) -> None:
+        payload = Day.from_dict({"tasks": []})
+        add_task(payload, "Tests", command="pytest", inputs=["src/**/*.py"])
+        add_task(payload, "Docs", command="mkdocs build", inputs=["docs/*.md"])
+        add_task(payload, "No inputs", command="make")
+        affected = affected_tasks(payload, {"src/pkg/mod.py"})
+        self.assertEqual([task.text for task in affected], ["Tests"])
+
+
+class DayDriveInstrumentationTests(unittest.TestCase):
+    def test_execute_records_wall_cpu_and_rss(self) -> None:
+        payload = Day(date=date.today().isoformat())
+        add_task(payload, "Busy", command="python3 -c 'sum(range(3000000))'")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            payload, results = execute_pending_commands(payload, Path(tmp), run_all=True)
+
+        last_run = payload.tasks[0].last_run
+        self.assertGreater(last_run["duration_s"], 0)
+        self.assertGreater(results[0]["duration_s"], 0)
+        if hasattr(os, "wait4"):
+            self.assertGreater(last_run["cpu_user_s"] + last_run["cpu_sys_s"], 0)
+            self.assertGreater(last_run["max_rss_kb"], 1000)
+
+    @unittest.skipUnless(os.name == "posix", "the rusage probe is POSIX only")
+    def test_peak_rss_is_the_commands_not_the_runners(self) -> None:
+        # Touch every page, so the runner's own high-water mark really is this large.
+        ballast = bytearray(200 * 1024 * 1024)
+        for offset in range(0, len(ballast), 4096):
+            ballast[offset] = 1
+
+        with tempfile.TemporaryDirectory() as tmp:
+            small = run_streaming("true", Path(tmp), timeout_seconds=10)
+            large = run_streaming("python3 -c 'x = bytearray(100 * 1024 * 1024)'", Path(tmp), timeout_seconds=10)
+        del ballast
+
+        self.assertLess(small.max_rss_kb, 50 * 1024)
+        self.assertGreater(large.max_rss_kb, 100 * 1024)
+        self.assertLess(large.max_rss_kb, 200 * 1024)
+
+    def test_timing_profile_flags_regression(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = HistoryIndex(Path(tmp) / "history.sqlite")
+            for minute in range(6):
+                index.record_task(
+                    "2026-03-01",
+                    Task.from_dict(
+                        {
+                            "id": 1,
+                            "text": "Build",
+                            "command": "make",
+                            "last_run": {"returncode": 0, "finished_at": f"2026-03-01T10:0{minute}:00", "duration_s": 10.0},
+                        }
+                    ),
+                )
+            slow_data = {
+                "id": 1,
+                "text": "Build",
+                "command": "make",
+                "last_run": {"returncode": 0, "finished_at": "2026-03-01T11:00:00", "duration_s": 30.0},
+            }
+            slow = Task.from_dict(slow_data)
+            index.record_task("2026-03-01", slow)
+
+            profile = index.timing_profile(slow)
+            self.assertEqual(profile.samples, 6)
+            self.assertEqual(profile.p50_s, 10.0)
+            self.assertTrue(profile.regression)
+
+            payload = Day.from_dict({"date": "2026-03-01", "tasks": [dict(slow_data, kind="command", status="done")]})
+            self.assertIn("REGRESSION", list_tasks(payload, index))
+            report = build_review(payload, Path(tmp), index)
+            self.assertIn("## Run Timings", report)
+            self.assertIn("last 30.0s, p50 10.0s, p95 10.0s, REGRESSION", report)
+
+    def test_timing_profiles_share_one_query_across_tasks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = HistoryIndex(Path(tmp) / "history.sqlite")
+
+            def build(task_id: int, minute: int, duration: float) -> Task:
+                last_run = {"returncode": 0, "finished_at": f"2026-03-01T10:{minute:02d}:00", "duration_s": duration}
+                return Task.from_dict({"id": task_id, "text": "Build", "command": "make", "last_run": last_run})
+
+            for minute in range(8):
+                index.record_task("2026-03-01", build(1, minute, float(minute + 1)))
+            early, late = build(1, 3, 4.0), build(2, 7, 8.0)
+            untimed = Task.from_dict({"id": 3, "text": "Lint", "command": "make lint"})
+
+            statements = []
+            index.conn.set_trace_callback(statements.append)
+            profiles = index.timing_profiles([early, late, untimed])
+            index.conn.set_trace_callback(None)
+
+            self.assertEqual(len(statements), 1)
+            self.assertEqual((profiles[1].samples, profiles[1].p50_s), (3, 2.0))
+            self.assertEqual((profiles[2].samples, profiles[2].p50_s), (7, 4.0))
+            self.assertNotIn(3, profiles)
+            self.assertEqual(index.timing_profile(early), profiles[1])
+
+    def test_percentile_interpolates(self) -> None:
+        self.assertEqual(percentile([1.0, 2.0, 3.0, 4.0], 0.5), 2.5)
+        self.assertEqual(percentile([5.0], 0.95), 5.0)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+
+class DayDriveHistoryTests(unittest.TestCase):
+    @staticmethod
+    def _task(task_id: int, command: str, returncode: int, finished_at: str) -> Task:
+        return Task.from_dict(
+            {
+                "id": task_id,
+                "text": command,
+                "command": command,
+                "started_at": finished_at[:-2] + "00",
+                "last_run": {"returncode": returncode, "finished_at": finished_at},
+            }
+        )
+
+    def test_record_task_rolls_up_each_run(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = HistoryIndex(Path(tmp) / "history.sqlite")
+            index.record_task("2026-03-01", self._task(1, "pytest", 1, "2026-03-01T10:00:30"))
+            index.record_task("2026-03-01", self._task(1, "pytest", 0, "2026-03-01T11:00:10"))
+            index.record_task("2026-03-02", self._task(1, "pytest", 0, "2026-03-02T09:00:20"))
+            index.record_task("2026-03-02", self._task(1, "pytest", 0, "2026-03-02T09:00:20"))
+
+            stats = index.command_stats("2026-03-01")
+            self.assertEqual(len(stats), 1)
+            self.assertEqual((stats[0].runs, stats[0].failures), (3, 1))
+            self.assertEqual(stats[0].max_duration_s, 30.0)
+            self.assertEqual([row[0] for row in index.daily_trend("2026-03-02")], ["2026-03-02"])
+            self.assertEqual(index.slowest_runs("2026-03-01", 1)[0][3], 30.0)
+            self.assertIn("pytest", render_history(index, "2026-03-01", trend=True, slowest=2))
+
+    def test_rollup_leaves_cached_and_untimed_runs_out_of_rates(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            index = HistoryIndex(Path(tmp) / "history.sqlite")
+            runs = [
+                {"returncode": 1, "finished_at": "2026-03-01T10:00:00", "duration_s": 10.0},
+                {"returncode": 0, "finished_at": "2026-03-01T11:00:00", "duration_s": 20.0},
+                {"returncode": 0, "finished_at": "2026-03-01T12:00:00", "cached": True},
+                {"returncode": 0, "finished_at": "2026-03-01T13:00:00", "cached": True},
+                # No duration and no started_at to derive one from.
+                {"returncode": 0, "finished_at": "2026-03-01T14:00:00"},
+            ]
+            for last_run in runs:
+                task = Task.from_dict({"id": 1, "text": "make", "command": "make", "last_run": last_run})
+                index.record_task("2026-03-01", task)
+
+            stats = index.command_stats("2026-03-01")[0]
+            self.assertEqual((stats.runs, stats.failures, stats.cached_runs, stats.timed_runs), (5, 1, 2, 2))
+            self.assertEqual(stats.mean_duration_s, 15.0)
+            self.assertAlmostEqual(stats.failure_rate, 1 / 3)
+
+    def test_store_save_updates_history(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp))
+            today = date.today()
+            store.add_task(today, "Fail", command="exit 1")
+            payload = store.load_or_create(today)
+            execute_pending_commands(payload, Path(tmp), run_all=True)
+            store.save(today, payload)
+
+            stats = store.history.command_stats(today.isoformat(), match="exit")
+            self.assertEqual((stats[0].runs, stats[0].failures), (1, 1))
+
+    def test_compact_archives_old_days_and_keeps_them_loadable(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp))
+            old_day = date(2025, 6, 1)
+            payload = store.load_or_create(old_day)
+            add_task(payload, "Old work")
+            store.save(old_day, payload)
+            store.load_or_create(date.today())
+
+            archived = store.compact(date(2026, 1, 1))
+
+            self.assertEqual(archived, [old_day])
+            self.assertFalse(store.day_path(old_day).exists())
+            self.assertEqual(store.load_or_create(old_day).tasks[0].text, "Old work")
+            self.assertTrue(store.day_path(date.today()).exists())
+            with self.assertRaises(ValueError):
+                DailyStore(Path(tmp), storage="sqlite").compact(date.today())
+
+
+    def test_rebuild_includes_archived_days(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = DailyStore(Path(tmp))
+            old_day = date(2025, 6, 1)
+            payload = store.load_or_create(old_day)
+            add_task(payload, "Old build", command="make")
+            payload.tasks[0].last_run = {"returncode": 0, "finished_at": "2025-06-01T10:00:00", "duration_s": 4.0}
+            store.save(old_day, payload)
+            store.compact(date(2026, 1, 1))
+            store.history.close()
+            store.history.path.unlink()
+
+            self.assertEqual(store.backend.days(), [old_day])
+            self.assertEqual(store.rebuild_history(), 1)
+            self.assertEqual(store.history.command_stats("2025-01-01")[0].runs, 1)
+
+class FixedCapacity(Capacity):
+    def __init__(self, load: float, memory_mb: int, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.load = load
+        self.memory_mb = memory_mb
+
+    def load_average(self) -> float:
+        return self.load
+
+    def available_memory_mb(self) -> int:
+        return self.memory_mb
+
+
+class DayDriveSchedulerTests(unittest.TestCase):
+    def test_plain_run_skips_admission_control(self) -> None:
+        self.assertIsNone(run_capacity(1, 0.0, None))
+        self.assertEqual(run_capacity(4, 0.0, None).min_free_mb, 256)
+        self.assertEqual(run_capacity(1, 3.0, None).max_load, 3.0)
+        self.assertEqual(run_capacity(1, 0.0, 1024).min_free_mb, 1024)
+
+    def test_priority_orders_execution(self) -> None:
+        payload = Day(date=date.today().isoformat())
+        add_task(payload, "Low", command="echo low")
+        add_task(payload, "High", command="echo high", schedule=schedule_fields(priority=5))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _, results = execute_pending_commands(payload, Path(tmp), limit=1)
+
+        self.assertEqual([result["text"] for result in results], ["High"])
+
+    def test_failed_task_backs_off_then_gives_up(self) -> None:
+        task = Task.from_dict({"id": 1, "status": "failed", "attempts": 1, "retry": {"max_attempts": 3, "backoff_s": 10}})
+        now = datetime(2026, 3, 1, 12, 0, 0)
+        schedule_retry(task, now)
+        self.assertEqual(task.next_attempt_at, "2026-03-01T12:00:10")
+        self.assertFalse(eligible(task, now))
+        self.assertTrue(eligible(task, now + timedelta(seconds=10)))
+
+        task.attempts = 2
+        schedule_retry(task, now)
+        self.assertEqual(task.next_attempt_at, "2026-03-01T12:00:20")
+
+        task.attempts = 3
+        self.assertFalse(eligible(task, now + timedelta(days=1)))
+
+    def test_failed_task_without_policy_retries_immediately(self) -> None:
+        self.assertTrue(eligible(Task.from_dict({"id": 1, "status": "failed", "attempts": 9}), datetime.now()))
+
+    def test_capacity_backfills_light_tasks(self) -> None:
+        heavy = Task(id=1, text="Heavy", mem_mb=4000)
+        light = Task(id=2, text="Light")
+        capacity = FixedCapacity(load=0.5, memory_mb=3000, max_load=4, min_free_mb=256)
+        scheduler = Scheduler([heavy, light], capacity)
+
+        self.assertIs(scheduler.next_task([]), light)
+        self.assertIsNone(scheduler.next_task([light]))
+
+    def test_capacity_limits_concurrency_by_load(self) -> None:
+        capacity = FixedCapacity(load=1.0, memory_mb=8000, max_load=2.5)
+        first, second = Task(id=1, text="First"), Task(id=2, text="Second")
+        self.assertTrue(capacity.admits(first, []))
+        self.assertFalse(capacity.admits(second, [first]))
+        self.assertFalse(FixedCapacity(load=3.0, memory_mb=8000, max_load=2.5).admits(first, []))
+
+    def test_starving_task_runs_alone_after_patience(self) -> None:
+        clock = iter([0.0, 0.0, 100.0])
+        capacity = FixedCapacity(load=9.0, memory_mb=8000, max_load=2, patience_s=30)
+        scheduler = Scheduler([Task(id=1, text="Starving")], capacity, clock=lambda: next(clock))
+        self.assertIsNone(scheduler.next_task([]))
+        self.assertIsNone(scheduler.next_task([Task(id=9, text="Other")]))
+        self.assertEqual(scheduler.next_task([]).id, 1)
+
+    def test_parallel_jobs_run_concurrently(self) -> None:
+        payload = Day(date=date.today().isoformat())
+        for index in range(3):
+            add_task(payload, f"Sleep {index}", command="sleep 0.5")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            started = datetime.now()
+            _, results = execute_pending_commands(payload, Path(tmp), run_all=True, jobs=3)
+            elapsed = (datetime.now() - started).total_seconds()
+
+        self.assertEqual(sorted(result["id"] for result in results), [1, 2, 3])
+        self.assertLess(elapsed, 1.4)
+
+
+def _init_repo(root: Path) -> None:
+    for args in (["init", "-q"], ["config", "user.email", "dev@example.com"], ["config", "user.name", "Dev"]):
+        subprocess.run(["git", *args], cwd=root, check=True)
+    (root / "app.txt").write_text("committed\n", encoding="utf-8")
+    subprocess.run(["git", "add", "."], cwd=root, check=True)
+    subprocess.run(["git", "commit", "-qm", "init"], cwd=root, check=True)
+
+
+class DayDriveWorktreeTests(unittest.TestCase):
+    def test_isolated_tasks_run_in_pooled_worktrees(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "repo"
+            repo.mkdir()
+            _init_repo(repo)
+            (repo / "app.txt").write_text("edited\n", encoding="utf-8")
+            pool = WorktreePool(repo, Path(tmp) / "pool", max_size=2)
+
+            payload = Day(date=date.today().isoformat())
+            add_task(payload, "Build", command="cat app.txt; echo out > build.log")
+            add_task(payload, "Check", command="cat app.txt")
+            payload, results = execute_pending_commands(payload, repo, run_all=True, jobs=2, workspaces=pool)
+
+            self.assertEqual([result["status"] for result in results], ["done", "done"])
+            self.assertEqual([task.last_run["stdout_tail"] for task in payload.tasks], ["edited", "edited"])
+            self.assertEqual({task.last_run["worktree"] for task in payload.tasks}, {"slot-0", "slot-1"})
+            self.assertFalse((repo / "build.log").exists())
+
+    def test_isolated_cache_key_follows_the_worktree(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "repo"
+            repo.mkdir()
+            _init_repo(repo)
+            pool = WorktreePool(repo, Path(tmp) / "pool", max_size=1)
+            cache = ResultCache(Path(tmp) / "cache")
+            edits = [
+                lambda: (repo / "notes.txt").write_text("untracked\n", encoding="utf-8"),
+                lambda: (repo / "notes.txt").write_text("never copied\n", encoding="utf-8"),
+                lambda: (repo / "app.txt").write_text("edited\n", encoding="utf-8"),
+            ]
+            outcomes = []
+            for edit in edits:
+                edit()
+                payload = Day(date=date.today().isoformat())
+                add_task(payload, "Show", command="cat app.txt", inputs=["*.txt"])
+                payload, results = execute_pending_commands(payload, repo, run_all=True, cache=cache, workspaces=pool)
+                outcomes.append((results[0].get("cached", False), payload.tasks[0].last_run["stdout_tail"]))
+
+            # Untracked files never reach the worktree, so changing one must not invalidate the result.
+            self.assertEqual(outcomes, [(False, "committed"), (True, "committed"), (False, "edited")])
+
+    def test_pool_reuses_slots_and_prunes_extra(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            repo = Path(tmp) / "repo"
+            repo.mkdir()
+            _init_repo(repo)
+            pool = WorktreePool(repo, Path(tmp) / "pool", max_size=2)
+            first = pool.acquire()
+            second = pool.acquire()
+            pool.release(first)
+            self.assertEqual(pool.acquire(), first)
+            pool.release(first)
+            pool.release(second)
+
+            smaller = WorktreePool(repo, Path(tmp) / "pool", max_size=1)
+            self.assertEqual(smaller.prune(), [second])
+            self.assertTrue(first.exists())
+            self.assertFalse(second.exists())
+
+
+class DayDriveSnapshotTests(unittest.TestCase):
+    def test_parse_status_reads_branch_and_entries(self) -> None:
+        text = "# branch.oid abc\n# branch.head main\n1 .M N... 100644 100644 100644 a b app.txt\n? new.txt\n"
+        self.assertEqual(parse_status(text), ("main", 2))
+        self.assertEqual(parse_status("# branch.head (detached)\n"), ("", 0))
+
+    def test_snapshots_are_cached_until_head_or_index_changes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            api, web = Path(tmp) / "api", Path(tmp) / "web"
+            for repo in (api, web):
+                repo.mkdir()
+                _init_repo(repo)
+            (web / "app.txt").write_text("edited\n", encoding="utf-8")
+            now = [1000.0]
+            cache = SnapshotCache(Path(tmp) / "snapshots.json", ttl_s=60, clock=lambda: now[0])
+
+            first = collect_snapshots([api, web], cache=cache)
+            self.assertEqual([first[repo]["dirty_files"] for repo in (api, web)], [0, 1])
+            self.assertEqual(len(first[api]["today_commits"]), 1)
+
+            with unittest.mock.patch("daydrive.snapshots._snapshot_all") as rerun:
+                self.assertEqual(collect_snapshots([api, web], cache=cache), first)
+            rerun.assert_not_called()
+
+            subprocess.run(["git", "commit", "-qam", "edit"], cwd=web, check=True)
+            second = collect_snapshots([api, web], cache=cache)
+            self.assertEqual(second[web]["dirty_files"], 0)
+            self.assertEqual(len(second[web]["today_commits"]), 2)
+
+            now[0] += 61
+            with unittest.mock.patch("daydrive.snapshots._snapshot_all", return_value=[first[api], first[web]]) as rerun:
+                collect_snapshots([api, web], cache=cache)
+            rerun.assert_called_once()
+
+    def test_review_aggregates_workspace_repos(self) -> None:
+        snapshots = {
+            Path("/src/api"): {"branch": "main", "dirty_files": 2, "today_commits": ["abc fix"]},
+            Path("/src/web"): {"branch": "n/a", "dirty_files": 0, "today_commits": []},
+        }
+        report = build_review(Day(date=date.today().isoformat()), Path("/src/api"), snapshots=snapshots)
+        self.assertIn("- Repositories: 2", report)
+        self.assertIn("- Dirty files: 2 in 1 repo(s)", report)
+        self.assertIn("### web", report)
+        self.assertEqual(review_repos(Path("/"), [Path("/src/api"), Path("/src/api/")]), [Path("/src/api")])
+
+
+class DayDriveBenchTests(unittest.TestCase):
+    def test_benchmark_report_is_comparable(self) -> None:
+        params = dict(QUICK_PARAMS, tasks=20, notes=5, days=3, day_tasks=2, throughput_tasks=3, jobs=[2], repeat=1)
+        report = run_benchmarks(params, ("store", "history", "throughput"))
+
+        names = [row["name"] for row in report["results"]]
+        self.assertIn("store.sqlite.load_or_create", names)
+        self.assertIn("history.load_archived_day", names)
+        self.assertIn("throughput.jobs2", names)
+        self.assertTrue(all(row["median_s"] >= 0 for row in report["results"]))
+        self.assertEqual(report["meta"]["params"]["tasks"], 20)
+
+        baseline = json.loads(json.dumps(report))
+        baseline["results"][0]["median_s"] = report["results"][0]["median_s"] * 2 or 1.0
+        self.assertIn(report["results"][0]["name"], compare(report, baseline))
+
+    def test_synthetic_day_is_reproducible(self) -> None:
+        first = synthetic_day(date(2026, 1, 5), tasks=50, notes=3, seed=7)
+        self.assertEqual(first, synthetic_day(date(2026, 1, 5), tasks=50, notes=3, seed=7))
+        self.assertEqual(len(first.tasks), 50)
 
 
 if __name__ == "__main__":